@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#   You only get one! (match).
+#   An old style arcade platformer game. Written using tryengine and pygame.
+#   Copyright (C) 2014  Alejandro Aguilera (Fenixin) (fenixin@gmail.com)
+#   https://github.com/Fenixin/tryengine
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+""" Write the level cache for all the levels of the game.
+
+Levels are cached the first time they are loaded anyway, this just
+avoids the wait the first time the game is played.
+"""
+from os.path import join
+
+import pygame
+
+# pygame can't convert images without initializing pygame.display first
+pygame.init()
+pygame.font.init()
+pygame.display.set_mode((1,1))
+
+from tryengine.level import bake_map
+from data.level_list import level_list, level_dir
+
+maps = [level_list[n]['tmx_map'] for n in sorted(level_list)]
+maps.append(join(level_dir, "scorecounter.tmx"))
+
+for filename in maps:
+    if bake_map(filename):
+        print "Baked:", filename
+    else:
+        print "Up to date:", filename
+
+pygame.quit()
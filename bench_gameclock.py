@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#   You only get one! (match).
+#   An old style arcade platformer game. Written using tryengine and pygame.
+#   Copyright (C) 2014  Alejandro Aguilera (Fenixin) (fenixin@gmail.com)
+#   https://github.com/Fenixin/tryengine
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+""" Microbenchmark of the interval schedules of GameClock.
+
+Schedules hundreds of callbacks with different intervals and measures
+the cost of scheduling them and of a call to tick(). The clock runs
+with a fake time source, so the results don't depend on the machine
+being idle, only the work done by the clock is measured.
+"""
+import random
+from timeit import default_timer
+
+from tryengine.gameclock import GameClock
+
+TICKS = 6000
+STEP = 1 / 60.
+
+
+class FakeTime(object):
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+def bench(n_callbacks):
+    random.seed(n_callbacks)
+    fake_time = FakeTime()
+    clock = GameClock(60, 0, use_wait=False, time_source=fake_time)
+    callbacks = [lambda dt: None for i in xrange(n_callbacks)]
+
+    start = default_timer()
+    for c in callbacks:
+        clock.schedule_interval(c, random.uniform(0.05, 5.0))
+    schedule_time = default_timer() - start
+
+    start = default_timer()
+    for i in xrange(TICKS):
+        fake_time.now += STEP
+        clock.tick()
+    tick_time = default_timer() - start
+
+    # rescheduling has to unschedule the previous item
+    start = default_timer()
+    for c in callbacks:
+        clock.schedule_interval(c, random.uniform(0.05, 5.0))
+    reschedule_time = default_timer() - start
+
+    return schedule_time, tick_time, reschedule_time
+
+
+print "{0:>10} {1:>14} {2:>14} {3:>14}".format(
+    "callbacks", "schedule (us)", "tick (us)", "reschedule (us)")
+for n in (10, 100, 500, 1000, 5000):
+    schedule_time, tick_time, reschedule_time = bench(n)
+    print "{0:>10} {1:>14.2f} {2:>14.2f} {3:>14.2f}".format(n,
+        schedule_time / n * 1e6, tick_time / TICKS * 1e6,
+        reschedule_time / n * 1e6)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#   You only get one! (match).
+#   An old style arcade platformer game. Written using tryengine and pygame.
+#   Copyright (C) 2014  Alejandro Aguilera (Fenixin) (fenixin@gmail.com)
+#   https://github.com/Fenixin/tryengine
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+""" Benchmark of the levels of the game, without window and audio.
+
+Every level in data/level_list.py is loaded and played for a number of
+game updates with a scripted input, or with a recorded one (see
+tryengine/replay.py). Every level runs in its own process, so the
+caches and the peak memory of a level don't change the others.
+
+A JSON object is written per level and line with: the load time split
+in parse (reading the tmx or the level cache), convert (creating the
+surfaces) and build (creating the layers and the objects), the mean,
+p95, p99 and max of the update and render times, the peak memory and
+the objects of the level after loading it and at the end. Times are in
+seconds.
+
+    python bench_levels.py --ticks 1200 --output levels.jsonl
+    python bench_levels.py --level 2 --replay replay-000.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+from timeit import default_timer
+
+try:
+    import resource
+except ImportError:
+    # Not in Windows
+    resource = None
+
+# No window and no audio
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+from pygame.locals import K_LEFT, K_RIGHT, K_UP, K_DOWN, KEYDOWN, KEYUP
+
+import settings as s
+from data.level_list import level_list, level_dir
+
+# Keys held and for how many updates, played in a loop
+SCRIPT = [
+    (90, (K_RIGHT,)),
+    (10, (K_RIGHT, K_UP)),
+    (60, (K_RIGHT,)),
+    (20, ()),
+    (90, (K_LEFT,)),
+    (10, (K_LEFT, K_UP)),
+    (60, (K_LEFT,)),
+    (10, (K_DOWN,)),
+    (10, (K_UP,)),
+    ]
+
+
+def scripted_keys():
+    """ Generator of the keys held in every update. """
+    while True:
+        for ticks, keys in SCRIPT:
+            for i in xrange(ticks):
+                yield keys
+
+
+def post_keys(held, keys):
+    """ Post the key events to go from the keys held to keys. """
+    for key in held:
+        if key not in keys:
+            pygame.event.post(pygame.event.Event(KEYUP, key=key))
+    for key in keys:
+        if key not in held:
+            pygame.event.post(pygame.event.Event(KEYDOWN, key=key))
+
+
+def percentile(values, p):
+    """ Value below which are p percent of the sorted values. """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(len(values) * p / 100.)))
+    return values[index]
+
+
+def time_stats(times):
+    times = sorted(times)
+    return {
+        'mean': sum(times) / len(times) if times else None,
+        'p95': percentile(times, 95),
+        'p99': percentile(times, 99),
+        'max': times[-1] if times else None,
+        }
+
+
+def peak_memory():
+    """ Peak resident memory of the process in KiB, None if unknown. """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes in Mac OS X
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak
+
+
+def level_objects(level):
+    """ Count the things a level is made of. """
+    from tryengine.level import ObjectLayer, TileLayer
+    return {
+        'layers': len(level.layers),
+        'tile_layers': sum(1 for l in level.layers if isinstance(l, TileLayer)),
+        'collision_sprites': len(level.collision_group),
+        'mobs': len(level.mobs),
+        'hostiles': len(level.hostiles),
+        'actionsprites': len(level.actionsprites),
+        'pending_objects': sum(len(l.pending_objects) for l in level.layers
+                               if isinstance(l, ObjectLayer)),
+        }
+
+
+def init_game():
+    """ Set up pygame and the globals as game.py does. """
+    pygame.mixer.pre_init(frequency=44100, size=-16, channels=2, buffer=4096)
+    pygame.init()
+    pygame.font.init()
+    pygame.mixer.set_num_channels(24)
+    pygame.display.set_mode(s.actual_frame_size)
+    s.scale = 1
+
+    from tryengine.utils import Borg
+    from tryengine.fontrenderer import FontRenderer
+    glo = Borg()
+    glo.emulator_font = FontRenderer("fonts/Emulator.ttf", False)
+    glo.tandysoft_font = FontRenderer("fonts/Tandysoft.ttf", False)
+    glo.default_font = FontRenderer(pygame.font.get_default_font())
+    glo.actual_screen_size = s.actual_frame_size
+    glo.hiscore = 10000
+    glo.score = 0
+    glo.bonus = 3000
+    glo.lives = s.NORMAL_DIFFICULTY_LIVES
+    glo.start_lives = s.NORMAL_DIFFICULTY_LIVES
+    glo.extra_lives = 2
+    glo.last_game_won = False
+    glo.quitting = False
+    glo.difficulty = s.NORMAL_DIFFICULTY
+
+
+def load_level(filename):
+    """ Load a Map timing every step, see level.load_tiledmap. """
+    import pytmx
+    from pytmx import tmxloader
+    from tryengine import levelcache
+    from tryengine.constants import PINK_TRANSPARENT
+    from tryengine.level import Map
+    from tryengine.utils import load_image
+
+    t0 = default_timer()
+    cached = levelcache.read(filename) if s.level_cache else None
+    if cached:
+        tiledmap, layers = cached
+    else:
+        tiledmap, layers = pytmx.TiledMap(filename), {}
+    t1 = default_timer()
+    tmxloader.load_images_pygame(tiledmap, None, force_colorkey = PINK_TRANSPARENT, load_image = load_image)
+    for index, (size, pixels) in layers.items():
+        layers[index] = levelcache.layer_surface(size, pixels)
+    t2 = default_timer()
+    level = Map(filename, (tiledmap, layers, bool(cached)))
+    t3 = default_timer()
+
+    return level, {'parse': t1 - t0, 'convert': t2 - t1, 'build': t3 - t2}
+
+
+def bench_level(number, ticks, replay=None, seed=0):
+    """ Load and play a level, return its record. """
+    init_game()
+
+    from tryengine.engine import Engine
+    from tryengine.eventbus import bus
+    from tryengine.scenestack import SceneStack
+    from scripts.scenes import TiledScene
+
+    info = level_list[number]
+    level, load_times = load_level(info['tmx_map'])
+    objects = level_objects(level)
+
+    # The scene seeds the random numbers with a random seed, or the one
+    # of the replay
+    random.seed(seed)
+    s.replay_input = replay
+    scene_stack = SceneStack()
+    engine = Engine(scene_stack)
+    scene = TiledScene(level, info['music'], info['mobs_mods'],
+                       os.path.join(level_dir, "scorecounter.tmx"))
+    scene_stack.push(scene)
+
+    keys = None if replay else scripted_keys()
+    held = ()
+    update_times = []
+    render_times = []
+    for i in xrange(ticks):
+        if keys:
+            new_held = next(keys)
+            post_keys(held, new_held)
+            held = new_held
+        step = 1. / s.TICKS_PER_SECOND
+
+        t0 = default_timer()
+        bus.pump()
+        engine.run_updates(scene, step)
+        t1 = default_timer()
+        scene.new_frame
+        t2 = default_timer()
+        engine.handle_events()
+
+        update_times.append(t1 - t0)
+        render_times.append(t2 - t1)
+        # The player died or won
+        if scene.finished or scene_stack.top() is not scene:
+            break
+
+    end_objects = level_objects(scene.level)
+    end_objects.update(scene.telemetry())
+    scene.stop()
+    engine.close()
+    pygame.quit()
+
+    return {
+        'level': number,
+        'name': info['name'],
+        'map': info['tmx_map'],
+        'ticks': len(update_times),
+        'load': load_times,
+        'load_total': sum(load_times.values()),
+        'update': time_stats(update_times),
+        'render': time_stats(render_times),
+        'peak_memory_kb': peak_memory(),
+        'objects': objects,
+        'objects_end': end_objects,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--level', type=int, action='append',
+        help="level number in data/level_list.py, all of them by default")
+    parser.add_argument('--ticks', type=int, default=600,
+        help="game updates played in every level")
+    parser.add_argument('--replay',
+        help="replay file to play instead of the scripted input")
+    parser.add_argument('--seed', type=int, default=0,
+        help="random seed of the levels without replay")
+    parser.add_argument('--cache', action='store_true',
+        help="load the levels from the level cache")
+    parser.add_argument('--output',
+        help="write the JSON lines to this file, default stdout")
+    parser.add_argument('--in-process', action='store_true',
+        help="run in this process, only for a single level")
+    args = parser.parse_args()
+
+    s.level_cache = args.cache
+    levels = args.level or sorted(level_list)
+    out = open(args.output, 'w') if args.output else sys.stdout
+
+    if args.in_process:
+        if len(levels) != 1:
+            parser.error("--in-process needs a single --level")
+        record = bench_level(levels[0], args.ticks, args.replay, args.seed)
+        out.write(json.dumps(record, sort_keys=True) + "\n")
+        return
+
+    failed = False
+    for number in levels:
+        cmd = [sys.executable, __file__, '--in-process',
+               '--level', str(number), '--ticks', str(args.ticks),
+               '--seed', str(args.seed)]
+        if args.replay:
+            cmd += ['--replay', args.replay]
+        if args.cache:
+            cmd.append('--cache')
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        output = proc.communicate()[0]
+        # The game prints things, the record is the last line
+        lines = output.strip().splitlines()
+        if proc.returncode or not lines:
+            failed = True
+            record = {'level': number, 'error': proc.returncode}
+        else:
+            record = json.loads(lines[-1])
+        out.write(json.dumps(record, sort_keys=True) + "\n")
+        out.flush()
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
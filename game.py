@@ -69,6 +69,8 @@ pygame.display.set_caption(s.GAME_NAME)
 from tryengine import engine
 
 from tryengine.scenestack import SceneStack
+from tryengine.scene import LazyScene
+from tryengine.level import MapPreloader
 from scripts.scenes import TitleScene, ComicScene, TiledScene, TextScene, TransitionScene
 from data.level_list import level_list
 
@@ -123,7 +125,12 @@ def round_loop(scene_stack, level_list, glo, start_level=1, round_start=1, incre
             for mob in mobs_mods:
                 for mod in mobs_mods[mob]:
                     mobs_mods[mob][mod] *= 1 + (round_number -1) * increase_per_round
-        scene_stack.push(TiledScene(level_map, level_music, mobs_mods, scorecounter))
+        # Load the level while the comic and the texts are shown, the
+        # scene is created when the transition to it starts
+        preloader = MapPreloader(level_map)
+        e.add_background_task(preloader)
+        scene_stack.push(LazyScene(lambda: TiledScene(preloader, level_music, mobs_mods, scorecounter),
+                                   lambda: e.remove_background_task(preloader)))
         scene_stack.push(TransitionScene())
         scene_stack.push(TextScene(["ROUND {0}".format (round_number), "STAGE {0}".format(level_number), "{0}".format(level_name)], 3))
         scene_stack.push(ComicScene(level_comic))
@@ -166,4 +173,5 @@ while not glo.quitting:
     round_loop(scene_stack, level_list, glo, start_level, start_round, increase_per_round)
 
 
+e.close()
 pygame.quit()
@@ -51,6 +51,7 @@ key_definitios = {
     (K_s, KMOD_LCTRL): (DELAYED, e.Event(ENGINE, code = CYCLE_DISPLAY_MODES)),
     K_F10: (DELAYED, e.Event(ENGINE, code = CYCLE_DISPLAY_MODES)),
     K_F12: (DELAYED, e.Event(ENGINE, code = SCREENSHOT)),
+    K_F9: (DELAYED, e.Event(ENGINE, code = PROFILE)),
     #~ (K_v, KMOD_LCTRL): (DELAYED, e.Event(ENGINE, code = SUPER_LOW_FPS), (0.1,)),
     #~ K_q: (DELAYED, e.Event(ENGINE, code = QUIT), (0.1,)),
 #     K_ESCAPE: (DELAYED, e.Event(ENGINE, code = PAUSE)),
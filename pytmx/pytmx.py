@@ -78,9 +78,79 @@ class TiledMap(TiledElement):
         self.imagemap = {}  # mapping of gid and trans flags to real gids
         self.maxgid = 1
 
+        # indexes of the tiles and objects, see buildIndexes
+        self.clearIndexes()
+
         if filename: self.load()
 
 
+    def __getstate__(self):
+        # the indexes are built again when needed, don't pickle them
+        state = self.__dict__.copy()
+        for k in self.index_attributes:
+            del state[k]
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.clearIndexes()
+
+
+    index_attributes = "gid_locations layer_gids objects_by_type objects_by_name".split()
+
+    def clearIndexes(self):
+        """
+        forget the indexes, they will be built again the next time they are
+        used.  call it after changing the layer data or the objects.
+        """
+
+        for k in self.index_attributes:
+            setattr(self, k, None)
+
+
+    def buildIndexes(self):
+        """
+        build the indexes used by the lookup methods:
+
+        gid_locations:   gid -> list of (x, y, layer), empty tiles not included
+        layer_gids:      list with the set of gids used in each tile layer
+        objects_by_type: object type -> list of objects
+        objects_by_name: object name -> list of objects
+
+        they are built when the map is loaded.
+        """
+
+        locations = defaultdict(list)
+        layer_gids = []
+        for l, layer in enumerate(self.tilelayers):
+            for y, row in enumerate(layer.data):
+                for x, gid in enumerate(row):
+                    if gid:
+                        locations[gid].append((x, y, l))
+            layer_gids.append(set(chain.from_iterable(layer.data)))
+
+        # same order as the old full scan: by x, then y, then layer
+        for l in locations.itervalues():
+            l.sort()
+
+        by_type = defaultdict(list)
+        by_name = defaultdict(list)
+        for o in self.getObjects():
+            by_type[o.type].append(o)
+            by_name[o.name].append(o)
+
+        self.gid_locations = dict(locations)
+        self.layer_gids = layer_gids
+        self.objects_by_type = dict(by_type)
+        self.objects_by_name = dict(by_name)
+
+
+    def _indexes(self):
+        if self.gid_locations is None:
+            self.buildIndexes()
+
+
     def __repr__(self):
         return "<{0}: \"{1}\">".format(self.__class__.__name__, self.filename)
 
@@ -195,14 +265,52 @@ class TiledMap(TiledElement):
 
 
     def getTileLocation(self, gid):
-        # experimental way to find locations of a tile by the GID
+        """
+        Return a list of (x, y, layer) with the locations of a tile by GID
+        """
+
+        if not gid:
+            # empty tiles are not indexed
+            p = product(xrange(self.width),
+                        xrange(self.height),
+                        xrange(len(self.tilelayers)))
+
+            return [ (x,y,l) for (x,y,l) in p
+                   if self.tilelayers[l].data[y][x] == gid ]
 
-        p = product(xrange(self.width),
-                    xrange(self.height),
-                    xrange(len(self.tilelayers)))
+        self._indexes()
+        return list(self.gid_locations.get(gid, ()))
 
-        return [ (x,y,l) for (x,y,l) in p
-               if self.tilelayers[l].data[y][x] == gid ]
+
+    def getLayerGIDs(self, layer):
+        """
+        Return the set of GIDs used in a tile layer, 0 if it has empty tiles
+        """
+
+        self._indexes()
+        try:
+            return set(self.layer_gids[int(layer)])
+        except IndexError:
+            msg = "Layer {0} does not exist."
+            raise ValueError, msg.format(layer)
+
+
+    def getObjectsByType(self, type):
+        """
+        Return a list of the objects with the type
+        """
+
+        self._indexes()
+        return list(self.objects_by_type.get(type, ()))
+
+
+    def getObjectsByName(self, name):
+        """
+        Return a list of the objects with the name
+        """
+
+        self._indexes()
+        return list(self.objects_by_name.get(name, ()))
 
 
     def getTilePropertiesByGID(self, gid):
@@ -236,8 +344,7 @@ class TiledMap(TiledElement):
             msg = "Layer must be an integer.  Got {0} instead."
             raise ValueError, msg.format(type(layer))
 
-        p = product(range(self.width),range(self.height))
-        layergids = set( self.tilelayers[layer].data[y][x] for x, y in p )
+        layergids = self.getLayerGIDs(layer)
 
         props = []
         for gid in layergids:
@@ -295,24 +402,39 @@ class TiledMap(TiledElement):
     def load(self):
         """
         parse a map node from a tiled tmx file
+
+        the file is parsed as a stream, every layer is processed when its
+        element ends and then cleared, so the whole xml tree is never in
+        memory.
         """
-        etree = ElementTree.parse(self.filename).getroot()
-        self.set_properties(etree)
+        root = None
 
         # initialize the gid mapping
         self.imagemap[(0,0)] = 0
-        
-        for node in etree.iter():
+
+        for event, node in ElementTree.iterparse(self.filename, ('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    # the map attributes, its properties come at the end
+                    root = node
+                    self.set_properties(root)
+                continue
+
             if node.tag == 'tileset':
+                # tilesets are parsed later, keep the node
                 self.tilesets.append(TiledTileset(self, node))
-            else:
-                if node.tag == 'layer':
-                    self.addTileLayer(TiledLayer(self, node))
-                elif node.tag == 'imagelayer':
-                    self.addImageLayer(TiledImageLayer(self, node))
-                elif node.tag == 'objectgroup':
-                    self.objectgroups.append(TiledObjectGroup(self, node))
-                    self.all_layers.append(self.objectgroups[-1])
+            elif node.tag == 'layer':
+                self.addTileLayer(TiledLayer(self, node))
+                node.clear()
+            elif node.tag == 'imagelayer':
+                self.addImageLayer(TiledImageLayer(self, node))
+                node.clear()
+            elif node.tag == 'objectgroup':
+                self.objectgroups.append(TiledObjectGroup(self, node))
+                self.all_layers.append(self.objectgroups[-1])
+                node.clear()
+            elif node is root:
+                self.set_properties(root)
 
         # "tile objects", objects with a GID, have need to have their
         # attributes set after the tileset is loaded
@@ -327,6 +449,8 @@ class TiledMap(TiledElement):
             t.parse(t.node)
             t.node = False
 
+        self.buildIndexes()
+
 
     def addTileLayer(self, layer):
         """
@@ -340,6 +464,7 @@ class TiledMap(TiledElement):
         self.tilelayers.append(layer)
         self.all_layers.append(layer)
         self.layernames[layer.name] = layer
+        self.clearIndexes()
         
 
     def addImageLayer(self, layer):
@@ -529,10 +654,8 @@ class TiledLayer(TiledElement):
         """
         parse a layer element
         """
-        from utils import group
-        from itertools import product, imap
-        from struct import unpack
         import array
+        import sys
 
         self.set_properties(node)
 
@@ -547,9 +670,8 @@ class TiledLayer(TiledElement):
             data = decodestring(data_node.text.strip())
 
         elif encoding == "csv":
-            next_gid = imap(int, "".join(
-                line.strip() for line in data_node.text.strip()
-                ).split(","))
+            next_gid = "".join(line.strip() for line in
+                               data_node.text.strip()).split(",")
 
         elif encoding:
             msg = "TMX encoding type: {0} is not supported."
@@ -571,28 +693,43 @@ class TiledLayer(TiledElement):
             msg = "TMX compression type: {0} is not supported."
             raise Exception, msg.format(str(attr["compression"]))
 
+        # raw gids are 32-bit unsigned ints
+        typecode = 'I' if array.array('I').itemsize == 4 else 'L'
+
         # if data is None, then it was not decoded or decompressed, so
         # we assume here that it is going to be a bunch of tile elements
         # TODO: this will probably raise an exception if there are no tiles
         if encoding == next_gid is None:
-            def get_children(parent):
-                for child in parent.findall('tile'):
-                    yield int(child.get('gid'))
+            next_gid = (child.get('gid') for child in data_node.findall('tile'))
+
+        if data:
+            # data is a list of little endian gids, read all of them at once
+            raw_gids = array.array(typecode)
+            raw_gids.fromstring(data)
+            if sys.byteorder == 'big':
+                raw_gids.byteswap()
+        else:
+            raw_gids = array.array(typecode, (int(i) for i in next_gid))
 
-            next_gid = get_children(data_node)
+        size = self.width * self.height
+        if len(raw_gids) > size:
+            del raw_gids[size:]
 
-        elif data:
-            # data is a list of gids. cast as 32-bit ints to format properly
-            # create iterator to efficiently parse data
-            next_gid=imap(lambda i:unpack("<L", "".join(i))[0], group(data, 4))
+        # register only the different gids in order of appearance, the
+        # internal gids are the same that registering them one by one
+        register = self.parent.registerGID
+        gids = {}
+        for raw_gid in raw_gids:
+            if raw_gid not in gids:
+                gids[raw_gid] = register(*decode_gid(raw_gid))
 
         # using bytes here limits the layer to 256 unique tiles
         # may be a limitation for very detailed maps, but most maps are not
         # so detailed.
-        [ self.data.append(array.array("H")) for i in xrange(self.height) ]
-
-        for (y, x) in product(xrange(self.height), xrange(self.width)):
-            self.data[y].append(self.parent.registerGID(*decode_gid(next(next_gid))))
+        internal_gids = map(gids.__getitem__, raw_gids)
+        w = self.width
+        self.data = [ array.array("H", internal_gids[y*w:(y+1)*w])
+                      for y in xrange(self.height) ]
 
 
 class TiledObjectGroup(TiledElement, list):
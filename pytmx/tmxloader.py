@@ -232,6 +232,20 @@ def pygame_convert(original, colorkey, force_colorkey, pixelalpha):
 
 def load_images_pygame(tmxdata, mapping, *args, **kwargs):
     """
+    load all the tile images of tmxdata at once.
+
+    see iter_load_images_pygame.
+    """
+
+    for i in iter_load_images_pygame(tmxdata, mapping, *args, **kwargs):
+        pass
+
+
+def iter_load_images_pygame(tmxdata, mapping, *args, **kwargs):
+    """
+    generator that loads the tile images, one tile every iteration.  it can
+    be used to spread the loading of a map over several frames.
+
     due to the way the tiles are loaded, they will be in the same pixel format
     as the display when it is loaded.  take this into consideration if you
     intend to support different screen pixel formats.
@@ -245,6 +259,10 @@ def load_images_pygame(tmxdata, mapping, *args, **kwargs):
     tileset with colorkey transparency will greatly increase the speed of
     rendering the map.
 
+    tileset images are loaded with the function given as "load_image",
+    pygame.image.load by default.  it can be used to share them using a
+    cache, the images are never modified.
+
     optionally, you can force the loader to strip the alpha channel of the
     tileset image and to fill in the missing areas with a color, then use that
     new color as a colorkey.  the resulting tiles will render much faster, but
@@ -290,6 +308,7 @@ def load_images_pygame(tmxdata, mapping, *args, **kwargs):
     pixelalpha     = kwargs.get("pixelalpha", False)
     force_colorkey = kwargs.get("force_colorkey", False)
     force_bitdepth = kwargs.get("depth", False)
+    load_image     = kwargs.get("load_image", pygame.image.load)
 
     if force_colorkey:
         try:
@@ -303,7 +322,7 @@ def load_images_pygame(tmxdata, mapping, *args, **kwargs):
     for firstgid, t in sorted((t.firstgid, t) for t in tmxdata.tilesets):
         path = os.path.join(os.path.dirname(tmxdata.filename), t.source)
 
-        image = pygame.image.load(path)
+        image = load_image(path)
 
         w, h = image.get_size()
         tile_size = (t.tilewidth, t.tileheight)
@@ -339,6 +358,8 @@ def load_images_pygame(tmxdata, mapping, *args, **kwargs):
                 tile = pygame_convert(tile, colorkey, force_colorkey, pixelalpha)
                 tmxdata.images[gid] = tile
 
+            yield
+
 
 def load_pygame(filename, *args, **kwargs):
     tmxdata = load_tmx(filename, *args, **kwargs)
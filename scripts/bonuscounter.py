@@ -62,7 +62,11 @@ class BonusCounter(TrySprite):
         sp = glo.spritesheet
         spritesheet = sp
         self.bonus_frame = spritesheet.subsurface(Rect(16*8, 144, 16* 4, 16*2)).copy()
-        
+
+        # Text and color shown right now in the counter
+        self.text_in_counter = None
+        self.color_in_counter = None
+
         # Just to get the first image
         self.update(None, None, None)
         TrySprite.__init__(self, self.image, obj['x'], obj['y'], self.image.get_rect())
@@ -72,10 +76,7 @@ class BonusCounter(TrySprite):
         self.hostile = False
 
     def update(self, platforms, new_sprites_group, player):
-        text_image = self.text_image
-        self.image = self.bonus_frame.copy()
-        self.image.blit(text_image, bonus_text_coords)
-
+        color = self.layers[self.index_layer_normal][1]['color']
         if glo.bonus <= self.low_score:
             color = self.low_color
         elif glo.bonus < self.med_score:
@@ -84,10 +85,18 @@ class BonusCounter(TrySprite):
             color = self.hig_color
         self.layers[self.index_layer_normal][1]['color'] = color
 
+        # Render the image only when the text or the color change
+        text = self.text
+        if text != self.text_in_counter or color != self.color_in_counter:
+            self.text_in_counter = text
+            self.color_in_counter = color
+            self.image = self.bonus_frame.copy()
+            self.image.blit(self.text_image, bonus_text_coords)
+            self.dirty = 1
+
     @property
     def text_image(self):
-        text = self.text
-        text_image = self.font.render(text, self.font_size, self.bg_color, self.bg_transparent, self.layers)
+        text_image = self.font.render(self.text, self.font_size, self.bg_color, self.bg_transparent, self.layers)
         text_image.set_colorkey(self.bg_color)
         return text_image
 
@@ -41,8 +41,9 @@ font = pygame.font.Font(emulator_file, 10)
 class HiScoreCounter(TrySprite):
     """ """
     def __init__(self, **obj):
-        text = "SCORE: {0}".format(glo.lives)
-        image = font.render(text, False, WHITE, BLACK)
+        # Hi score shown right now in the counter
+        self.hiscore_in_counter = glo.hiscore
+        image = self.text_image
         TrySprite.__init__(self, image, obj['x'], obj['y'], image.get_rect())
         filename =  split(obj['parent'].tilesets[0].source)[-1]
         filename = join(ss_dir, filename)
@@ -56,15 +57,24 @@ class HiScoreCounter(TrySprite):
         self.killable = False
         self.hostile = False
 
+    @property
+    def text(self):
+        return "HI: {0}".format(glo.hiscore)
+
+    @property
+    def text_image(self):
+        image = font.render(self.text, False, WHITE, BLACK)
+        image.set_colorkey(BLACK)
+        return image
+
     def update(self, platforms, new_sprites_group, player):
-        self.dirty = 1
         self.player = player
-        self.image.fill(BLACK)
-        # Render the text
         if glo.score > glo.hiscore:
             glo.hiscore = glo.score
-        text = "HI: {0}".format(glo.hiscore)
-        self.image = font.render(text, False, WHITE, BLACK)
-        self.image.set_colorkey(BLACK)
+        # Render the text only when the hi score changes
+        if glo.hiscore != self.hiscore_in_counter:
+            self.hiscore_in_counter = glo.hiscore
+            self.image = self.text_image
+            self.dirty = 1
 
 
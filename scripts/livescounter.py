@@ -52,6 +52,8 @@ class LivesCounter(TrySprite):
         self.live_image = pygame.transform.scale(live_image, (12,12))
         
         self.text = "LIVES:"
+        # The text never changes, render it only once
+        self.text_image = font.render(self.text, False, WHITE, BLACK)
         image = self.get_lives_image(self.text, glo.lives, self.live_image)
         TrySprite.__init__(self, image, obj['x'], obj['y'], image.get_rect())
 
@@ -96,17 +98,18 @@ class LivesCounter(TrySprite):
         else:
             final_lives = glo.lives
         
+        # Update the image only if the number of lives shown changes
         if final_lives != self.lives_in_counter:
             #~ print "Updating image!"
             self.lives_in_counter = final_lives
-        # Update it every frame...
-        self.image = self.get_lives_image(self.text, final_lives, scale(player.image,(12,12)), 3, self.lives_pos_offset)
+            self.image = self.get_lives_image(self.text, final_lives, self.live_image, 3, self.lives_pos_offset)
+            self.dirty = 1
 
     def get_lives_image(self, text, num_lives, live_image, separation = 3, lives_pos_offset = (0,0)):
         loffset = lives_pos_offset
         y_pos_text = 2
-        w_text, h_text = font.size(text)
-        text_image = font.render(text, False, WHITE, BLACK)
+        text_image = self.text_image
+        w_text, h_text = text_image.get_size()
         w_image, h_image = live_image.get_size()
         
         w = w_text + separation * num_lives + num_lives * w_image
@@ -64,20 +64,33 @@ class MatchCounter(TrySprite):
         
         self.x_size = self.image.get_size()[0]
 
+        # End of the flame and flame frame drawn right now, or if the
+        # match is drawn burnt
+        self.x_in_counter = None
+        self.fire_in_counter = None
+        self.burnt = False
+
         # minimum stuff tu be a mob
         self.killable = False
         self.hostile = False
 
     def update(self, platforms, new_sprites_group, player):
-        self.dirty = 1
         self.player = player
-        self.image.fill(PINK_TRANSPARENT)
         # This must be a number between 100.0 and - inifinite
         amount_of_fire = self.player.lit
         min_x = 20
         if amount_of_fire >= 0:
             # -20 offset, -8 center of flame
             x_coord = 20 + int((self.x_size - 20 - 8) * amount_of_fire / 100.)
+            f = self.fire_a.get_next_frame()
+            # Draw it only when the match burns or the flame moves
+            if x_coord == self.x_in_counter and f is self.fire_in_counter:
+                return
+            self.x_in_counter = x_coord
+            self.fire_in_counter = f
+            self.burnt = False
+            self.dirty = 1
+            self.image.fill(PINK_TRANSPARENT)
 
             match_rect = self.match.get_rect()
             match_rect.width = x_coord
@@ -86,7 +99,9 @@ class MatchCounter(TrySprite):
             burnt_rect = pygame.Rect(x_coord, 0, self.burnt_match.get_size()[0] - x_coord, 24)
             self.image.blit(self.burnt_match, (x_coord, 0), burnt_rect)
             
-            f = self.fire_a.get_next_frame()
             self.image.blit(f,(x_coord - 8,4))
-        else:
+        elif not self.burnt:
+            self.x_in_counter = self.fire_in_counter = None
+            self.burnt = True
             self.image = self.burnt_match.copy()
+            self.dirty = 1
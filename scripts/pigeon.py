@@ -243,25 +243,6 @@ class Pigeon(Mob):
             else:
                 self.accel_up()
         
-    def get_events(self):
-        l = pygame.event.get(PLAYER)
-        for e in l:
-            if e.code == LEFT:
-                self.moving = True
-                self.accel_left()
-            elif e.code == RIGHT:
-                self.accel_right()
-                self.moving = True
-            elif e.code == JUMP:
-                self.jump = True
-            elif e.code == USE:
-                self.using = True
-                self.use_next_frame()
-            elif e.code == SHOOT:
-                self.shoot_next_frame()
-            elif e.code == RESPAWN:
-                self.respawn()
-
     def update(self, platforms, new_sprites_group, player):
         """ Generic mob update function. For a very basic mob you can
             modify the method used here and get the mob moving. """
@@ -19,9 +19,10 @@
 from os.path import join, split
 from math import pi, hypot, ceil, cos
 
-from pygame import Rect, event
+from pygame import Rect
 
 from tryengine.constants import *
+from tryengine.eventbus import bus
 from tryengine.utils import extend_dict, Timer, load_sound, Borg, image_loader
 from tryengine.animation import SpeedUpdateAnimationPlayer, Animation,\
                             OnceUpdateAnimationPlayer, UpdateAnimationPlayer
@@ -462,7 +463,7 @@ class Player(Mob):
         """ Handle all PLAYER events and do actions. """
 
         moving_left = moving_right = False
-        l = event.get(PLAYER)
+        l = bus.get(PLAYER)
         # HACK: If you hit use no other order is taken!
         t = [i for i in l if i.code == USE]
         if t:
@@ -17,6 +17,7 @@
 #
 
 from math import pi, atan2, hypot, ceil, cos
+import random as rnd
 import sys
 from os.path import split, join
 from random import random, choice, randint
@@ -26,12 +27,15 @@ import pygame.event as e
 from pygame.locals import *
 
 from tryengine.constants import *
+from tryengine.eventbus import bus
 from tryengine.playerinput import Input
+from tryengine.replay import InputRecorder, InputReplay
 from tryengine.utils import Timer, Borg, collision_detection, image_loader,\
-    fast_tint
+    fast_tint, timers, free_filename
 from tryengine.scene import SceneWithMusic, hor_justify_sprites, x_center_sprites, ver_justify_sprites, center_in_length
 from tryengine.sprites import ImageSprite, TrySprite, TryGroup
-from tryengine.level import Map
+from tryengine.level import Map, MapPreloader, MapWatcher, ObjectLayer
+from tryengine.particles import BaseParticle
 from tryengine.animation import Animation, UpdateAnimationPlayer
 from scripts.particles import CoveringSprite, RotatingPaletteScoreText, \
     SimpleAnimatedParticle, RandImageParticle, AnimatedRandParticle
@@ -84,10 +88,10 @@ class SimpleScene(SceneWithMusic):
         color = 0, 0, 0
         surf.fill(color, rect)
     def handle_input(self, *args):
-        if pygame.event.get(QUIT):
+        if bus.get(QUIT):
             glo.quitting = True
             self.finished = True
-        l = pygame.event.get(KEYDOWN)
+        l = bus.get(KEYDOWN)
         for e in l:
             if e.key == K_ESCAPE or e.key == K_p:
                 self.stack.push(PauseScene())
@@ -100,11 +104,11 @@ class SimpleScene(SceneWithMusic):
                 glo.last_game_won = True
             elif e.key == K_F11 or (e.key == K_RETURN and \
                     (pygame.key.get_mods() & KMOD_ALT)):
-                pygame.event.post(pygame.event.Event(ENGINE, code = TOGGLE_FULLSCREEN))
+                bus.post(pygame.event.Event(ENGINE, code = TOGGLE_FULLSCREEN))
             elif e.key == K_F10:
-                pygame.event.post(pygame.event.Event(ENGINE, code = CYCLE_DISPLAY_MODES))
+                bus.post(pygame.event.Event(ENGINE, code = CYCLE_DISPLAY_MODES))
             elif e.key == K_F12:
-                pygame.event.post(pygame.event.Event(ENGINE, code = SCREENSHOT))
+                bus.post(pygame.event.Event(ENGINE, code = SCREENSHOT))
 
 
 class TitleScene(SimpleScene):
@@ -367,10 +371,10 @@ class TitleScene(SimpleScene):
         """ Please note, this must be similar to all the scenes
         input so it doesn't change what controls to use. """
         
-        if pygame.event.get(QUIT):
+        if bus.get(QUIT):
             glo.quitting = True
             self.finished = True
-        l = pygame.event.get(KEYDOWN)
+        l = bus.get(KEYDOWN)
         for e in l:
             if e.key == K_ESCAPE or e.key == K_p:
                 self.stack.push(PauseScene())
@@ -381,13 +385,13 @@ class TitleScene(SimpleScene):
                 self.finished = True
             elif e.key == K_F11 or (e.key == K_RETURN and \
                     (pygame.key.get_mods() & KMOD_ALT)): # Fullscreen
-                pygame.event.post(pygame.event.Event(ENGINE, code = TOGGLE_FULLSCREEN))
+                bus.post(pygame.event.Event(ENGINE, code = TOGGLE_FULLSCREEN))
                 if not s.fullscreen:
                     self.key_zoom_spr.text = self.key_zoom.format("X3")
                 else:
                     self.key_zoom_spr.text = self.key_zoom.format("X" + str(s.scale))
             elif e.key == K_F10: # Display modes
-                pygame.event.post(pygame.event.Event(ENGINE, code = CYCLE_DISPLAY_MODES))
+                bus.post(pygame.event.Event(ENGINE, code = CYCLE_DISPLAY_MODES))
                 scale = s.scale + 1 if s.scale < 3 else 1
                 t = self.key_zoom.format("X" + str(scale))
                 self.key_zoom_spr.text = t
@@ -404,7 +408,7 @@ class TitleScene(SimpleScene):
                     glo.difficulty = s.NORMAL_DIFFICULTY
 
             elif e.key == K_F12: # Screenshot
-                pygame.event.post(pygame.event.Event(ENGINE, code = SCREENSHOT))
+                bus.post(pygame.event.Event(ENGINE, code = SCREENSHOT))
 
     def handle_events(self, *args):
         pass
@@ -528,9 +532,8 @@ class TiledScene(SimpleScene):
         # filled up after loading a map
         self.location_to_spawn = None
 
-        # this events can overflow the queue in some ocasions, after
-        # using them they are cleared from the queue every frame
-        # TODO: this should not happen 
+        # events nobody took in an update, triggers are only looked
+        # at, are dropped from the bus after the update
         self.events_to_clear = [TRIGGER, PLAYER]
 
         # is the player running?
@@ -541,6 +544,10 @@ class TiledScene(SimpleScene):
         from key_defs import key_definitios
         self.kb.bind_key_dict(key_definitios)
 
+        # Record or replay the input, the random seed must be the same
+        # to play the same game again
+        self.init_replay(map_to_load)
+
         # Init stuff
         self.load_map(map_to_load)
         self.init_renderer()
@@ -602,17 +609,19 @@ class TiledScene(SimpleScene):
         self.transfer_sound_updates_per_play = 5
 
         # Apply mobs modifiers by type
-        if mobs_modifiers:
-            for m in self.mobs.sprites():
-                if type(m) in mobs_modifiers:
-                    mods = mobs_modifiers[type(m)]
-                    for key in mods:
-                        m.__dict__[key] = mods[key]
+        self.mobs_modifiers = mobs_modifiers
+        self.apply_mobs_modifiers(self.mobs.sprites())
+
+        # Create the lazy objects around the starting point
+        self.activate_objects()
+
+        # Reload the map when it's edited
+        self.map_watcher = MapWatcher(self.level, s.watch_maps_interval) if s.watch_maps else None
 
         # Get the scorecounter if there's one and add it to the current
         # level
         if scorecounter:
-            counters = Map(scorecounter)
+            counters = Map(scorecounter, lazy_objects=False)
             layer = counters.layers[0]
             self.level.get_info_object_layer(layer)
             # Last layer, last rendered (on top)
@@ -672,6 +681,59 @@ class TiledScene(SimpleScene):
            }
 
 
+    def apply_mobs_modifiers(self, mobs):
+        """ Apply the mobs modifiers of the level by type. """
+        mobs_modifiers = self.mobs_modifiers
+        if mobs_modifiers:
+            for m in mobs:
+                if type(m) in mobs_modifiers:
+                    mods = mobs_modifiers[type(m)]
+                    for key in mods:
+                        m.__dict__[key] = mods[key]
+
+    @property
+    def activation_rect(self):
+        """ Region of the map where lazy objects are created. """
+        camera = self.renderer.current_camera
+        rect = camera.last_screen_rect
+        if not rect:
+            # Nothing rendered yet, use the screen around the sprite
+            w = s.screen_size_in_tiles[0] * s.tile_width
+            h = s.screen_size_in_tiles[1] * s.tile_height
+            rect = pygame.Rect(0, 0, w, h)
+            rect.center = camera.sprite.rect.center
+        margin = s.activation_margin
+        return rect.inflate(margin * 2, margin * 2)
+
+    def activate_objects(self, everything=False):
+        """ Create the lazy objects of the level near the camera, or
+        all of them, and add them to the scene. """
+        new = self.level.activate_objects(None if everything else self.activation_rect)
+        if new:
+            self.mobs.add(new)
+            self.killables.add([spr for spr in new if spr.killable])
+            self.fireworks.add([spr for spr in new if isinstance(spr, scripts.FireworkLauncher)])
+            self.apply_mobs_modifiers(new)
+
+    def hot_reload(self, tilesets_changed=()):
+        """ Reload the changes of the map file keeping the player and
+        the camera as they are. """
+        print "Map changed, reloading: {0}".format(self.level.path)
+        result = self.level.reload(tilesets_changed)
+        if result is None:
+            print "Warning! The size or the layers of the map have changed, restart the level to see the changes."
+            return
+
+        new, background_changed = result
+        if new:
+            self.mobs.add(new)
+            self.killables.add([spr for spr in new if spr.killable])
+            self.fireworks.add([spr for spr in new if isinstance(spr, scripts.FireworkLauncher)])
+            self.apply_mobs_modifiers(new)
+        if background_changed:
+            self.renderer.rebuild_map_background()
+        self.map_watcher.watch(self.level)
+
     def toggle_cheats(self):
         """ Supersize player jump and speed. """
 
@@ -693,14 +755,54 @@ class TiledScene(SimpleScene):
         # init the renderer
         self.renderer = renderer.LayeredRenderer(self.level, self.screen_size_in_tiles, pygame.display.get_surface().get_size())
 
-        # render the static part of the map
-        self.renderer.render_map_background()
+        # render the static part of the map, unless it was preloaded
+        if self.level.background is not None:
+            self.renderer.set_map_background(self.level.background)
+        else:
+            self.renderer.render_map_background()
+
+    def init_replay(self, map_to_load):
+        """ Seed the random numbers and record or replay the input. """
+        if isinstance(map_to_load, MapPreloader):
+            map_path = map_to_load.filename
+        elif isinstance(map_to_load, Map):
+            map_path = map_to_load.path
+        else:
+            map_path = map_to_load
+        if s.replay_input:
+            replay = self.kb.replay = InputReplay(s.replay_input)
+            if replay.map_path != map_path:
+                print "Warning! The replay {0} was recorded in {1}".format(
+                    s.replay_input, replay.map_path)
+            seed = replay.seed
+        else:
+            seed = rnd.randint(0, 2**31 - 1)
+            if s.record_input:
+                filename = free_filename("replay-{:03}.jsonl",
+                                         "Too_many_replays.jsonl")
+                self.kb.recorder = InputRecorder(filename, seed, map_path)
+        rnd.seed(seed)
+
+    def stop(self):
+        SimpleScene.stop(self)
+        if self.kb.recorder:
+            self.kb.recorder.close()
+            self.kb.recorder = None
+        if self.kb.replay:
+            self.kb.replay.close()
+            self.kb.replay = None
 
     def load_map(self, map_to_load):
-        """ Take path to map and fill up variables. """
+        """ Take path to map, a MapPreloader or a loaded Map, and fill
+        up variables. """
         # loading the map
         try:
-            self.level = level = Map(map_to_load)
+            if isinstance(map_to_load, MapPreloader):
+                self.level = level = map_to_load.get_map()
+            elif isinstance(map_to_load, Map):
+                self.level = level = map_to_load
+            else:
+                self.level = level = Map(map_to_load)
         except Exception, e:
             
             print "{:=^60}".format("")
@@ -762,6 +864,7 @@ class TiledScene(SimpleScene):
         if s.CHEATS:
             # Ignite all the fireworks
             if kb_is_pressed(K_i):
+                self.activate_objects(everything=True)
                 for spr in self.mobs.sprites():
                     if isinstance(spr, scripts.FireworkLauncher):
                         spr.lit = True
@@ -777,6 +880,7 @@ class TiledScene(SimpleScene):
             
             # Get all coins!
             if kb_delayed_is_pressed(K_u, 1.0):
+                self.activate_objects(everything=True)
                 [mob.taken() for mob in self.mobs.sprites() if (isinstance(mob,scripts.Coin) and mob.visible )]
         
         if s.TOUCH_CONTROL:
@@ -797,15 +901,15 @@ class TiledScene(SimpleScene):
                 dangle =  angle * (180.0 /pi)
                 #~ print dangle
                 if dangle <= 70 and dangle > -45 and radius > 10:
-                    pygame.event.post(e.Event(PLAYER, code = RIGHT))
+                    bus.post(e.Event(PLAYER, code = RIGHT))
                 elif ((dangle > 110 and dangle <= 180) or (dangle <= -135 and dangle > -180)) and radius > 10:
-                    pygame.event.post(e.Event(PLAYER, code = LEFT))
+                    bus.post(e.Event(PLAYER, code = LEFT))
                 elif dangle <= -45 and dangle > -90 and radius > 10:
                     player.direction = DIR_RIGHT
-                    pygame.event.post(e.Event(PLAYER, code = USE))
+                    bus.post(e.Event(PLAYER, code = USE))
                 elif dangle <= -90 and dangle > -134 and radius > 10:
                     player.direction = DIR_LEFT
-                    pygame.event.post(e.Event(PLAYER, code = USE))
+                    bus.post(e.Event(PLAYER, code = USE))
             
             # Jumping
                     
@@ -856,12 +960,12 @@ class TiledScene(SimpleScene):
             
             # Correctly handle jumping:
             if self.event_counter1 and self.event1:
-                pygame.event.post(self.event1)
+                bus.post(self.event1)
                 self.event_counter1 -= 1
             else:
                 self.event1 = None
             if self.event_counter2 and self.event2:
-                pygame.event.post(self.event2)
+                bus.post(self.event2)
                 self.event_counter2 -= 1
             else:
                 self.event2 = None
@@ -877,11 +981,21 @@ class TiledScene(SimpleScene):
             self.stack.push(PauseScene())
 
     def update(self):
+        # To interpolate the drawing between this update and the last
+        self.renderer.save_positions()
+
         if self.first_update:
             pygame.mixer.music.load(self.music)
             pygame.mixer.music.play(0)
             self.first_update = False
 
+        self.activate_objects()
+
+        if self.map_watcher:
+            changed = self.map_watcher.changed()
+            if changed:
+                self.hot_reload([f for f in changed if f != self.map_watcher.map_file])
+
         # Check if all the fireworks are lit
         if self.all_fireworks_lit:
             pygame.mixer.music.fadeout(500)
@@ -889,6 +1003,8 @@ class TiledScene(SimpleScene):
             max_ticks_per_boom = 60
             ticks = 0
             if not self.player.winning:
+                # All the fireworks have to be there
+                self.activate_objects(everything=True)
                 # Ignite all the fireworks
                 for spr in self.mobs.sprites():
                     if isinstance(spr, scripts.Firework):
@@ -964,8 +1080,8 @@ class TiledScene(SimpleScene):
             action.do()
         # action sprites update!
         actions.update(player, col)
-        # clear the event queue from TRIGGER events
-        pygame.event.clear(self.events_to_clear)
+        # clear the bus from TRIGGER events
+        bus.clear(self.events_to_clear)
 
         # Check for extra lives
         def get_extra_life():
@@ -1014,17 +1130,33 @@ class TiledScene(SimpleScene):
             pygame.mixer.music.stop()
             pygame.mixer.music.play()
 
+        self.renderer.update_camera()
+
+    def telemetry(self):
+        """ Numbers of this frame for the engine telemetry. """
+        particles = actionsprites = 0
+        for layer in self.level.layers:
+            if isinstance(layer, ObjectLayer):
+                particles += sum(1 for spr in layer.sprites() if isinstance(spr, BaseParticle))
+                actionsprites += len(layer.actionsprites)
+        return {'mobs': len(self.mobs),
+                'particles': particles,
+                'actionsprites': actionsprites,
+                'dirty_rects': self.renderer.dirty_rect_count,
+                'dirty_area': self.renderer.dirty_area}
+
     @property
     def all_coins_taken(self):
         # List with all the visible coins
         l = [mob for mob in self.mobs.sprites() if (isinstance(mob,scripts.Coin) and mob.visible )]
-        # If there are no visible coins all are taken
-        return not bool(l)
+        # If there are no visible coins all are taken, the ones not
+        # created yet aren't taken for sure
+        return not bool(l) and not self.level.count_pending(scripts.Coin)
 
     @property
     def all_fireworks_lit(self):
         l = [mob for mob in self.mobs.sprites() if (isinstance(mob,scripts.FireworkLauncher) and not mob.lit )]
-        return not bool(l)
+        return not bool(l) and not self.level.count_pending(scripts.FireworkLauncher)
 
     def count_mob(self, mob_class):
         c = 0
@@ -1034,12 +1166,12 @@ class TiledScene(SimpleScene):
         return c
 
     @property
-    def new_frame(self, interpolate = 0.0):
-        self.renderer.interpolate_draw()
+    def new_frame(self):
+        self.renderer.interpolate_draw(interpolate = timers.interpolate)
         return self.renderer.current_screen
 
     @property
-    def frame(self, interpolate = 0.0):
+    def frame(self):
         return self.renderer.current_screen
 
 
@@ -1094,13 +1226,13 @@ class TransitionScene(SimpleScene):
         return self.frame_surface
 
     def handle_input(self, *args):
-        if pygame.event.get(QUIT):
+        if bus.get(QUIT):
             glo.quitting = True
             self.finished = True
-            pygame.event.post(pygame.event.Event(ENGINE, code = QUIT))
+            bus.post(pygame.event.Event(ENGINE, code = QUIT))
 
     def handle_events(self, *args):
-        if pygame.event.get(KEYDOWN):
+        if bus.get(KEYDOWN):
             self.finished = True
             glo.last_game_won = True
 
@@ -1195,10 +1327,10 @@ class PauseScene(TextScene):
         return self.frame_surface
 
     def handle_input(self, *args):
-        if pygame.event.get(QUIT):
+        if bus.get(QUIT):
             glo.quitting = True
             self.finished = True
-        l = pygame.event.get(KEYDOWN)
+        l = bus.get(KEYDOWN)
         for e in l:
             if e.key == K_ESCAPE or e.key == K_p:
                 self.finished = True
@@ -1212,5 +1344,5 @@ class PauseScene(TextScene):
                 for s in self.stack.stack:
                     s.finished = True
             elif e.key == K_F12:
-                pygame.event.post(pygame.event.Event(ENGINE, code = SCREENSHOT))
+                bus.post(pygame.event.Event(ENGINE, code = SCREENSHOT))
                 
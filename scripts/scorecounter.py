@@ -34,8 +34,11 @@ class ScoreCounter(TrySprite):
         self.bg_color = BLACK
         self.bg_transparent = True
 
+        # Score shown right now in the counter
+        self.score_in_counter = glo.score
+
         # Init the image and the parent
-        image = self.font.render(self.text, self.size, self.bg_color, self.bg_transparent, self.layers)
+        image = self.text_image
         TrySprite.__init__(self, image, obj['x'], obj['y'], image.get_rect())
 
         # minimum stuff tu be a mob
@@ -47,10 +50,15 @@ class ScoreCounter(TrySprite):
         text = "SCORE: {0}".format(glo.score)
         return text
 
+    @property
+    def text_image(self):
+        return self.font.render(self.text, self.size, self.bg_color, self.bg_transparent, self.layers)
+
     def update(self, platforms, new_sprites_group, player):
-        self.dirty = 1
         self.player = player
-        self.image.fill(BLACK)
-        # Render the text
-        self.image = self.font.render(self.text, self.size, self.bg_color, self.bg_transparent, self.layers)
+        # Render the text only when the score changes
+        if glo.score != self.score_in_counter:
+            self.score_in_counter = glo.score
+            self.image = self.text_image
+            self.dirty = 1
 
@@ -28,11 +28,54 @@ fullscreen = False
 
 TICKS_PER_SECOND = 100.0
 MAX_FPS = 60
+# Wait for the next frame with a high resolution clock, sleeping and
+# then busy waiting the last FRAME_SPIN_TIME seconds
+PRECISE_FRAME_PACING = True
+FRAME_SPIN_TIME = 0.002
+# Most game updates run in a frame to catch up after a slow frame, the
+# rest of the time is dropped
+MAX_UPDATES_PER_FRAME = 5
+# Seconds per frame given to background tasks (preloading levels)
+BACKGROUND_TASK_TIME = 0.004
 debug_mode = 0
 debug_modes = 2
 
 GAME_NAME = "You only get one! (match)"
 
+# Precompiled levels, see tryengine/levelcache.py
+level_cache = True
+level_cache_dir = "data/cache"
+
+# Create the objects of a level when they get near the camera instead
+# of at load time, and how near (in pixels)
+lazy_objects = False
+activation_margin = 128
+
+# Bytes of images and sounds kept loaded between levels
+asset_cache_size = 64 * 1024 * 1024
+
+# Reload the map when its files change, for level design. Seconds
+# between checks.
+watch_maps = False
+watch_maps_interval = 1.0
+
+# Frames profiled when the PROFILE engine event is received (F9), and
+# number of functions printed
+PROFILE_FRAMES = 300
+PROFILE_TOP = 25
+
+# Write per frame telemetry to this file, as "csv" or "jsonl" (JSON
+# lines), every telemetry_every frames. See tryengine/telemetry.py
+telemetry_file = None
+telemetry_format = "csv"
+telemetry_every = 1
+telemetry_queue_size = 1024
+
+# Record the player input of every level to replay-NNN.jsonl, or replay
+# a recorded file instead of the real input. See tryengine/replay.py
+record_input = False
+replay_input = None
+
 # Others:
 CHEATS = False
 TOUCH_CONTROL = False
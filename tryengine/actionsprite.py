@@ -23,6 +23,7 @@ from math import hypot
 import pygame
 
 from constants import *
+from eventbus import bus
 from utils import Timer
 from animation import OnceUpdateAnimationPlayer, Animation, UpdateAnimationPlayer
 from aparser import ArgumentParser
@@ -152,9 +153,8 @@ class ActionSprite(pygame.sprite.DirtySprite):
         self.dirty = 1
 
     def get_trigger(self, code = None, event_type = TRIGGER):
-        """ Gets all the TRIGGER events in the queue and return only
-        the one with code. Puts all the non returned events back in the
-        queue. """
+        """ Looks at the TRIGGER events in the bus and return only the
+        one with code. The events are left in the bus. """
         # TODO we suppose there are only one event of the trigger
         # at a given time
         # get the default code
@@ -162,8 +162,8 @@ class ActionSprite(pygame.sprite.DirtySprite):
 
         # get all the trigger events
         self.dprint("\n### In ActionSprite.get_trigger()")
-        l = pygame.event.get(event_type)
-        self.dprint("\t Trigger events from queue: {0}".format(str(l)))
+        l = bus.peek(event_type)
+        self.dprint("\t Trigger events from bus: {0}".format(str(l)))
         to_return = None
         if len(l) > 1:
             print "#############################################"
@@ -175,14 +175,6 @@ class ActionSprite(pygame.sprite.DirtySprite):
             if e.code == code:
                 self.dprint("\t\t\t We've got a trigger event! {0}".format(str(e)))
                 to_return = e
-        #~ # remove the event from the list
-        #~ if l and to_return:
-            #~ l.remove(to_return)
-        
-        # repost the events
-        for e in l:
-            pygame.event.post(e)
-
         return to_return
 
     def dprint(self, text):
@@ -219,7 +211,7 @@ class Trigger(ActionSprite):
         self.dprint("\n### In Trigger.do()")
         e = pygame.event.Event(TRIGGER, code = self.trigger_code)
         self.dprint("Event: {0}".format(e))
-        pygame.event.post(e)
+        bus.post(e)
 
 
 class UseTrigger(Trigger):
@@ -238,7 +230,7 @@ class UseTrigger(Trigger):
         if e:
             e = pygame.event.Event(TRIGGER, code = self.trigger_code)
             self.dprint("Event sent: {0}".format(e))
-            pygame.event.post(e)
+            bus.post(e)
 
 
 #~ class FuseTrigger(Trigger):
@@ -751,4 +743,4 @@ class CollisionTriggeredLoadMap(ActionSprite):
         self.dprint("\n### In Trigger.do()")
         e = pygame.event.Event(ENGINE, code = NEW_MAP, map_path = self.map, spawn = self.spawn)
         self.dprint("Event: {0}".format(e))
-        pygame.event.post(e)
+        bus.post(e)
@@ -22,7 +22,12 @@
 
 from random import random
 
-import pygame
+from utils import timers
+
+
+def get_ticks():
+    """ Milliseconds of game time. """
+    return int(timers.time * 1000)
 
 
 class Automata(object):
@@ -52,7 +57,7 @@ class Automata(object):
 
         # current state things
         self.current_state = start_state
-        self.last_time = pygame.time.get_ticks()
+        self.last_time = get_ticks()
         # stores the state before the last change
         self.last_state = start_state
 
@@ -119,7 +124,7 @@ class TimedAutomata(Automata):
         self.min_states_time = min_time_state
 
         # current state things
-        self.last_time = pygame.time.get_ticks()
+        self.last_time = get_ticks()
 
         # have we to skip the next timer?
         self.skip_timer = False
@@ -129,7 +134,7 @@ class TimedAutomata(Automata):
 
     def next_timed_state(self):
         self.dprint("\n### TimedAutomata.next_state")
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         cs = self.current_state
         min_time = self.min_states_time[cs]
         self.dprint("\t now = {0}; current_state = {1}; min_time = {2};".format(now, cs, min_time))
@@ -144,5 +149,5 @@ class TimedAutomata(Automata):
 
     def reset_timer(self):
         """ Sets the timer to zero. """
-        now = pygame.time.get_ticks()
+        now = get_ticks()
         self.last_time = now
@@ -30,6 +30,8 @@ import math
 
 import pygame
 
+from utils import interpolate_position
+
 
 class Camera(object):
     """ Class to derive all the other cameras. Contains common things.
@@ -47,8 +49,9 @@ class Camera(object):
         self.sprite = sprite
 
         # this will hold the a pygame rect that determine the subsurface
-        # of visible map
+        # of visible map, and the one from the previous update
         self._screen_rect = None
+        self.prev_screen_rect = None
 
         # shaking info
         self.frames_to_shake = 0
@@ -65,6 +68,29 @@ class Camera(object):
         # between 0 and 1
         self.friction_factor = 0.5
 
+    @property
+    def last_screen_rect(self):
+        """ The last Rect given by screen_rect, None if it hasn't been
+        used yet. Unlike screen_rect it doesn't move the camera. """
+        return self._screen_rect
+
+    def update(self):
+        """ Move the camera, once per game update. The previous screen
+        rect is kept to interpolate between them. """
+        self.prev_screen_rect = self._screen_rect
+        self._screen_rect = self.screen_rect
+
+    def interpolated_rect(self, interpolate, max_distance):
+        """ Return the screen rect between the last two updates, see
+        utils.interpolate_position. """
+        if self._screen_rect is None:
+            self.update()
+        rect = self._screen_rect
+        prev = self.prev_screen_rect
+        pos = interpolate_position(prev and prev.topleft, rect.topleft,
+                                   interpolate, max_distance)
+        return pygame.Rect(pos, rect.size)
+
     def check_final_coords(self, x, y):
         """ Takes the x and y coordinates of the screen rect and checks
         if they are inside the map surface. Returns the coords of the
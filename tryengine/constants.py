@@ -118,6 +118,7 @@ CONTROL_NEXT_MOB = ENGINE_SC + 11
 TEST_MOUSE_MOTION = ENGINE_SC + 12
 TOGGLE_FULLSCREEN = ENGINE_SC + 13
 SCREENSHOT = ENGINE_SC + 14
+PROFILE = ENGINE_SC + 15
 
 ENGINE_CODES = ['TOGGLE_FULLSCREEN',
     'NEW_MAP',
@@ -134,6 +135,7 @@ ENGINE_CODES = ['TOGGLE_FULLSCREEN',
     'SUPER_LOW_FPS',
     'TEST_MOUSE_MOTION',
     'SCREENSHOT',
+    'PROFILE',
     ]
 
 #===========================
@@ -27,14 +27,19 @@ This probably should be renamed to sceneloop or something like that.
 
 import sys
 from collections import deque
+import cProfile
 import os.path
+import pstats
 
 import pygame
 
 import settings as s
 from constants import *
-from gameclock import GameClock
-from utils import Borg
+from eventbus import bus
+from gameclock import GameClock, monotonic
+from quadtree import QuadTree
+from telemetry import TelemetryWriter
+from utils import Borg, timers, free_filename
 
 #TODO: THIS SHOULD NOT BE HERE
 from scripts.scenes import PauseScene
@@ -49,18 +54,38 @@ class Engine(object):
 
         self.scene_stack = scene_stack
 
-        # Choose correct method for timing
-        if sys.platform in('win32', 'cygwin'):
+        # Choose correct method for timing, the precise pacing uses its
+        # own clock
+        if sys.platform in('win32', 'cygwin') or s.PRECISE_FRAME_PACING:
             time_source = None
         else:
             time_source = lambda: pygame.time.get_ticks() / 1000.
         self.gclock = GameClock(s.TICKS_PER_SECOND, s.MAX_FPS,\
-                                time_source=time_source, use_wait=True)
+                                time_source=time_source, use_wait=True,
+                                precise_wait=s.PRECISE_FRAME_PACING,
+                                spin_time=s.FRAME_SPIN_TIME)
+
+        # Game time and its Timers, advanced by run_updates
+        self.timers = timers
+
+        # Game time not simulated yet, and counters of the time dropped
+        # and of the frames that needed more than one update
+        self.accumulator = 0.
+        self.dropped_time = 0.
+        self.catchup_bursts = 0
+
+        # Game updates run per second, measured every second
+        self.ups = 0.
+        self._ups_updates = 0
+        self._ups_start = monotonic()
 
         # show fps in window caption
         if s.CHEATS:
             fps_caption = lambda whatever: self.change_caption(
-                s.GAME_NAME + "; fps = " + str(self.gclock.fps))
+                s.GAME_NAME + "; fps = " + str(self.gclock.fps) +
+                "; dropped = {0:.2f}s; bursts = {1}; late: {2}".format(
+                    self.dropped_time, self.catchup_bursts,
+                    self.gclock.lateness))
             self.gclock.schedule_interval(fps_caption, 1.0)
         else:
             fps_caption = lambda whatever: self.change_caption(
@@ -79,6 +104,73 @@ class Engine(object):
         self.fullscreen_tmp_surface.fill(BLACK)
         self.scale = self.scale_windowed
 
+        # Work done in small pieces after every frame, see
+        # add_background_task
+        self.background_tasks = deque()
+
+        # Profiler capturing some frames, see start_profile
+        self.profiler = None
+        self.profile_frames_left = 0
+
+        # Per frame telemetry, see write_telemetry
+        self.frame_count = 0
+        self.telemetry = None
+        if s.telemetry_file:
+            self.telemetry = TelemetryWriter(s.telemetry_file,
+                s.telemetry_format, s.telemetry_queue_size)
+            self._telemetry_ticks = 0
+            self._telemetry_queries = 0
+
+        # What to do for every code of the ENGINE events, the handlers
+        # take the event
+        self.event_handlers = {
+            TOGGLE_FULLSCREEN: lambda event: self.toggle_fullscreen(),
+            RELOAD_MAP: lambda event: self.reload_map(),
+            CHEATS: lambda event: self.toggle_cheats(),
+            NEW_MAP: self.new_map,
+            CYCLE_DEBUG_MODES: self.cycle_debug_modes,
+            ONE_LAYER_UP: lambda event: self.player.one_layer_up(),
+            ONE_LAYER_DOWN: lambda event: self.player.one_layer_down(),
+            CYCLE_DISPLAY_MODES: self.cycle_display_modes,
+            SUPER_LOW_FPS: self.toggle_super_low_fps,
+            PAUSE: self.pause,
+            CONTROL_NEXT_MOB: self.control_next_mob,
+            SCREENSHOT: self.screenshot,
+            PROFILE: lambda event: self.start_profile(s.PROFILE_FRAMES),
+            }
+
+    def close(self):
+        """ Finish the work left before quitting. """
+        # The loop ended in the middle of a capture, keep what it has
+        if self.profiler:
+            self.stop_profile()
+        if self.telemetry:
+            self.telemetry.close()
+            self.telemetry = None
+
+    def add_background_task(self, task):
+        """ Add a task to be run in the spare time of the frames.
+
+        A task is any object with a step(max_time) method that works
+        for at most max_time seconds and returns True when finished.
+        Tasks are run one after the other.
+
+        """
+        self.background_tasks.append(task)
+
+    def remove_background_task(self, task):
+        """ Drop a task that isn't needed anymore. """
+        try:
+            self.background_tasks.remove(task)
+        except ValueError:
+            pass
+
+    def run_background_tasks(self):
+        """ Give a time slice to the first background task. """
+        tasks = self.background_tasks
+        if tasks and tasks[0].step(s.BACKGROUND_TASK_TIME):
+            tasks.popleft()
+
     def change_caption(self, text):
         """ Changes the window caption to text. """
         pygame.display.set_caption(text)
@@ -88,88 +180,103 @@ class Engine(object):
 
     def handle_events(self, *args):
         # engine events
-        l = pygame.event.get(ENGINE)
-        for event in l:
-            if event.code == TOGGLE_FULLSCREEN:
-                self.toggle_fullscreen()
-            elif event.code == RELOAD_MAP:
-                self.reload_map()
-            elif event.code == CHEATS:
-                self.toggle_cheats()
-            elif event.code == NEW_MAP:
-                self.done = True
-                self.location_to_spawn = event.spawn
-                self.map_to_load = event.map_path
-            elif event.code == CYCLE_DEBUG_MODES:
-                s.debug_mode = (s.debug_mode + 1) % s.debug_modes
-                self.renderer.redraw_background()
-            elif event.code == ONE_LAYER_UP:
-                self.player.one_layer_up()
-            elif event.code == ONE_LAYER_DOWN:
-                self.player.one_layer_down()
-            elif event.code == CYCLE_DISPLAY_MODES:
-                if not (pygame.display.get_surface().get_flags() & pygame.FULLSCREEN):
-                    print "Changing mode." 
-                    # try to switch to the next size, we can resize
-                    # the screen with the mouse, so this could
-                    # give a big error
-                    current_size = s.screen_size
-                    try:
-                        i = s.screen_sizes.index(current_size)
-                        try:
-                            i = i+1
-                            new_size = s.screen_sizes[i]
-                        except IndexError:
-                            i = 0
-                            new_size = s.screen_sizes[0]
-                    except ValueError:
-                        i = 0
-                        new_size = s.screen_sizes[0]
-                    pygame.display.set_mode(new_size)
-                    s.screen_size = new_size
-                    s.scale = i+1
-            elif event.code == SUPER_LOW_FPS:
-                self.fps = 1 if self.fps == 60 else 60
-            elif event.code == PAUSE:
-                print "Pause!"
-                self.scene_stack.push(PauseScene())
-            elif event.code == CONTROL_NEXT_MOB:
-                # Cutre implementation
-                self.player.player_controlled = False
-                self.player = self.mobs.sprites()[self.index]
-                self.player.player_controlled = True
-                if (self.index + 1 == len(self.mobs.sprites())):
-                    self.index = 0
-                else:
-                    self.index += 1
-            elif event.code == SCREENSHOT:
-                fn = self.get_screenshot_filename()
-                pygame.image.save(pygame.display.get_surface(), fn)
+        handlers = self.event_handlers
+        for event in bus.get(ENGINE):
+            handler = handlers.get(event.code)
+            if handler:
+                handler(event)
             else:
                 print "Unhandled event in type ENGINE!"
                 print event
 
         # events from the window
-        l = pygame.event.get((pygame.ACTIVEEVENT, pygame.VIDEORESIZE))
+        l = bus.get((pygame.ACTIVEEVENT, pygame.VIDEORESIZE, pygame.VIDEOEXPOSE))
         for event in l:
             if event.type == pygame.VIDEORESIZE:
                 pygame.display.set_mode(event.size, self.display_flags)
 
-        # other of events
-        l = pygame.event.get((pygame.ACTIVEEVENT, pygame.VIDEOEXPOSE))
-        for event in l:
-            #~ print event
-            pass
+    def new_map(self, event):
+        self.done = True
+        self.location_to_spawn = event.spawn
+        self.map_to_load = event.map_path
+
+    def cycle_debug_modes(self, event):
+        s.debug_mode = (s.debug_mode + 1) % s.debug_modes
+        self.renderer.redraw_background()
+
+    def cycle_display_modes(self, event):
+        if not (pygame.display.get_surface().get_flags() & pygame.FULLSCREEN):
+            print "Changing mode." 
+            # try to switch to the next size, we can resize
+            # the screen with the mouse, so this could
+            # give a big error
+            current_size = s.screen_size
+            try:
+                i = s.screen_sizes.index(current_size)
+                try:
+                    i = i+1
+                    new_size = s.screen_sizes[i]
+                except IndexError:
+                    i = 0
+                    new_size = s.screen_sizes[0]
+            except ValueError:
+                i = 0
+                new_size = s.screen_sizes[0]
+            pygame.display.set_mode(new_size)
+            s.screen_size = new_size
+            s.scale = i+1
+
+    def toggle_super_low_fps(self, event):
+        self.fps = 1 if self.fps == 60 else 60
+
+    def pause(self, event):
+        print "Pause!"
+        self.scene_stack.push(PauseScene())
+
+    def control_next_mob(self, event):
+        # Cutre implementation
+        self.player.player_controlled = False
+        self.player = self.mobs.sprites()[self.index]
+        self.player.player_controlled = True
+        if (self.index + 1 == len(self.mobs.sprites())):
+            self.index = 0
+        else:
+            self.index += 1
+
+    def screenshot(self, event):
+        fn = self.get_screenshot_filename()
+        pygame.image.save(pygame.display.get_surface(), fn)
 
     def get_screenshot_filename(self):
-        name = "screenshot-{:03}.png"
-        for i in range(1000):
-            t = name.format(i)
-            if os.path.isfile(t):
-                continue
-            else:
-                return t
-        return "Too_many_screenshots.png"
+        return self.get_free_filename("screenshot-{:03}.png",
+                                      "Too_many_screenshots.png")
+
+    def get_profile_filename(self):
+        return self.get_free_filename("profile-{:03}.prof",
+                                      "Too_many_profiles.prof")
+
+    def get_free_filename(self, name, too_many):
+        return free_filename(name, too_many)
+
+    def start_profile(self, frames):
+        """ Profile the next frames of the scene loop. """
+        if self.profiler:
+            return
+        print "Profiling the next {0} frames".format(frames)
+        self.profile_frames_left = frames
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self):
+        """ Write the stats of the profile and print the top functions
+        by cumulative time. """
+        self.profiler.disable()
+        fn = self.get_profile_filename()
+        self.profiler.dump_stats(fn)
+        print "Profile saved in {0}".format(fn)
+        stats = pstats.Stats(self.profiler)
+        stats.sort_stats('cumulative').print_stats(s.PROFILE_TOP)
+        self.profiler = None
 
     def get_best_fit(self, source_surface, destination_surface):
         s_size = source_surface.get_size()
@@ -226,20 +333,103 @@ class Engine(object):
                 scene_stack.pop()
                 continue
             
+            # Read the SDL queue once, the events wait in the bus
+            bus.pump()
             self.handle_events()
 
             # It's probably a good idea to handle input as it's done
             # now, outside of scene.update() NO IT'S NOT!!!!!!!
             gclock.tick()
 
-            if gclock.update_ready:
-                scene.handle_input()
-                scene.handle_events()
-                scene.update()
-                self.custom_update_actions()
+            t0 = monotonic()
+            updates = self.run_updates(scene, gclock.get_time())
             if gclock.frame_ready:
-                self.scale(scene.new_frame)
+                t1 = monotonic()
+                frame = scene.new_frame
+                t2 = monotonic()
+                self.scale(frame)
+                t3 = monotonic()
                 flip()
+                t4 = monotonic()
+                self.frame_count += 1
+                if self.telemetry and not self.frame_count % s.telemetry_every:
+                    self.write_telemetry(scene, updates,
+                        (t1 - t0, t2 - t1, t3 - t2, t4 - t3))
+                self.run_background_tasks()
+                if self.profiler:
+                    self.profile_frames_left -= 1
+                    if not self.profile_frames_left:
+                        self.stop_profile()
+
+    def run_updates(self, scene, elapsed):
+        """ Run the game updates for the elapsed seconds.
+
+        Updates have a fixed length, the time left is kept for the next
+        frame and used to interpolate the drawing. After a slow frame
+        up to MAX_UPDATES_PER_FRAME updates are run to catch up, the
+        rest of the time is dropped.
+
+        """
+        step = 1. / self.timers.ticks_per_second
+        self.accumulator += elapsed
+        updates = 0
+        while self.accumulator >= step:
+            if updates == s.MAX_UPDATES_PER_FRAME:
+                dropped = self.accumulator - self.accumulator % step
+                self.dropped_time += dropped
+                self.accumulator -= dropped
+                break
+            self.timers.tick()
+            self.timers.fire_due()
+            scene.handle_input()
+            scene.handle_events()
+            scene.update()
+            self.custom_update_actions()
+            self.accumulator -= step
+            updates += 1
+            # The scene has finished or other scene is on top
+            if scene.finished or self.scene_stack.top() is not scene:
+                break
+        if updates > 1:
+            self.catchup_bursts += 1
+
+        self._ups_updates += updates
+        now = monotonic()
+        if now - self._ups_start >= 1.:
+            self.ups = self._ups_updates / (now - self._ups_start)
+            self._ups_updates = 0
+            self._ups_start = now
+
+        self.timers.interpolate = min(self.accumulator / step, 1.)
+        return updates
+
+    def write_telemetry(self, scene, updates, times):
+        """ Send the record of this frame to the telemetry writer, see
+        telemetry.FIELDS. """
+        ticks = self.timers.ticks - self._telemetry_ticks
+        queries = QuadTree.queries - self._telemetry_queries
+        self._telemetry_ticks = self.timers.ticks
+        self._telemetry_queries = QuadTree.queries
+
+        update_time, render_time, scale_time, flip_time = times
+        record = {
+            'frame': self.frame_count,
+            'updates': self.timers.ticks,
+            'frame_updates': updates,
+            'fps': self.gclock.fps,
+            'ups': self.ups,
+            'update_time': update_time,
+            'render_time': render_time,
+            'scale_time': scale_time,
+            'flip_time': flip_time,
+            'quadtree_queries': float(queries) / ticks if ticks else 0.,
+            'dropped_events': bus.dropped,
+            }
+        # Scenes can add their own numbers
+        scene_telemetry = getattr(scene, 'telemetry', None)
+        if scene_telemetry:
+            record.update(scene_telemetry())
+        self.telemetry.write(record)
 
     def scale_windowed(self, surface):
         display = pygame.display.get_surface()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#   This file is part of TryEngine.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" In-process messaging between the parts of the engine.
+
+The engine, the renderer, the player and the action sprites send each
+other pygame Events of the types ENGINE, RENDERER, PLAYER and TRIGGER
+(see constants.py). They used to go through the SDL event queue, that
+is slow and can overflow. The EventBus has a deque per type (a channel)
+instead, and works without a display.
+
+Its methods are the ones of pygame.event used by the game, so it's a
+drop-in for them: events of the types that aren't channels go to the
+SDL queue, as the input and window events do.
+
+Subscribers are called when an event of their type is posted, and the
+event is still queued in its channel for the ones calling get().
+
+Once pump() is called, the bus reads the SDL queue only there, in one
+pass, putting every event in a channel of its type. The channels of the
+SDL events keep the last SDL_CHANNEL_SIZE events, as the SDL queue,
+because some of them nobody takes. The events dropped to keep them in
+that size are counted in dropped.
+
+The scene stack calls clear_input() when the scene on top changes, so a
+scene doesn't take the key presses meant for the last one.
+
+"""
+
+from collections import deque
+from itertools import count
+
+import pygame
+from pygame.locals import KEYDOWN, MOUSEMOTION, MOUSEBUTTONDOWN,\
+        JOYAXISMOTION, JOYBALLMOTION, JOYHATMOTION, JOYBUTTONDOWN
+
+from constants import RENDERER, TRIGGER, PLAYER, ENGINE
+
+SDL_CHANNEL_SIZE = 256
+
+# Input events that are stale once the scene on top changes. Releases
+# are not, the scene below still has the key held, and neither is QUIT
+STALE_INPUT_EVENTS = (KEYDOWN, MOUSEMOTION, MOUSEBUTTONDOWN, JOYAXISMOTION,
+                      JOYBALLMOTION, JOYHATMOTION, JOYBUTTONDOWN)
+
+
+def _types(types):
+    """ Return a tuple with the types, an int or a sequence. """
+    if isinstance(types, (list, tuple)):
+        return tuple(types)
+    return (types,)
+
+
+class EventBus(object):
+    """ A deque of events per channel and direct dispatch to the
+    subscribers. """
+
+    def __init__(self, channels):
+        self.channels = dict((t, deque()) for t in channels)
+        self.subscribers = {}
+        # The SDL queue is only read by pump()
+        self.pumping = False
+        # Channels keep (number, event), to give the events of several
+        # channels in the order they were posted
+        self._numbers = count()
+        # Events dropped because their channel was full
+        self.dropped = 0
+
+    def pump(self):
+        """ Move all the events in the SDL queue to their channels. """
+        self.pumping = True
+        for event in pygame.event.get():
+            self._queue(event)
+
+    def _queue(self, event):
+        try:
+            channel = self.channels[event.type]
+        except KeyError:
+            channel = self.channels[event.type] = deque((), SDL_CHANNEL_SIZE)
+        if len(channel) == channel.maxlen:
+            # The oldest one goes away
+            self.dropped += 1
+        channel.append((next(self._numbers), event))
+
+    def post(self, event):
+        """ Send an event. """
+        subscribers = self.subscribers.get(event.type)
+        if subscribers:
+            for callback in subscribers:
+                callback(event)
+        if self.pumping or event.type in self.channels:
+            self._queue(event)
+        elif not subscribers:
+            pygame.event.post(event)
+
+    def get(self, types=None):
+        """ Remove and return the queued events of the given types, all
+        of the channels if None, in the order they were posted. """
+        if types is None:
+            types = self.channels.keys()
+
+        queued = []
+        sdl_types = []
+        for t in _types(types):
+            channel = self.channels.get(t)
+            if channel is None:
+                if not self.pumping:
+                    sdl_types.append(t)
+            elif channel:
+                queued.extend(channel)
+                channel.clear()
+        queued.sort()
+        l = [event for n, event in queued]
+        if sdl_types:
+            l.extend(pygame.event.get(sdl_types))
+        return l
+
+    def peek(self, event_type):
+        """ Return the queued events of a channel without removing
+        them. """
+        return [event for n, event in self.channels[event_type]]
+
+    def clear(self, types=None):
+        """ Drop the queued events of the given channels, all of them
+        if None. """
+        types = self.channels.keys() if types is None else _types(types)
+        for t in types:
+            channel = self.channels.get(t)
+            if channel is None:
+                if not self.pumping:
+                    pygame.event.clear(t)
+            else:
+                channel.clear()
+
+    def clear_input(self):
+        """ Drop the stale input events, see STALE_INPUT_EVENTS. """
+        self.clear(STALE_INPUT_EVENTS)
+
+    def subscribe(self, event_type, callback):
+        """ Call callback(event) for every event of the type posted. """
+        self.subscribers.setdefault(event_type, []).append(callback)
+
+    def unsubscribe(self, event_type, callback):
+        self.subscribers[event_type].remove(callback)
+        if not self.subscribers[event_type]:
+            del self.subscribers[event_type]
+
+
+bus = EventBus((RENDERER, TRIGGER, PLAYER, ENGINE))
@@ -27,6 +27,7 @@ Module to render fonts with different effects.
 See FontRenderer for help.
 '''
 
+from collections import OrderedDict
 from itertools import product
 from math import ceil
 
@@ -56,11 +57,25 @@ class FontRenderer(object):
             ('textured',{'image':image_texture})
              ]
 
+    Every glyph is rendered once per size and layers and strings are
+    assembled blitting the glyphs, layer by layer, using the font
+    advances. The last glyph_cache_size glyphs and string_cache_size
+    rendered strings are kept in LRU caches. Textured layers fill the
+    whole image with the texture and internal borders depend on the
+    neighbour glyphs, so text using them is always rendered as a whole
+    (but still cached as a string). So is text with several shadows or
+    antialiased borders, that overlap in other order, and text that the
+    font doesn't place only by advances (kerning).
+
     '''
 
     TRANSPARENT = (255, 0, 255)
 
-    def __init__(self, font_file, antialias=False):
+    # Layers that can't be assembled from glyphs
+    NOT_GLYPH_LAYERS = ('textured', 'internal_border')
+
+    def __init__(self, font_file, antialias=False, string_cache_size=128,
+                 glyph_cache_size=512):
         '''
         Constructor
         '''
@@ -76,6 +91,14 @@ class FontRenderer(object):
         # Parameters to create images
         self.DISPLAY_BITDEPTH = pg.display.get_surface().get_bitsize()  
         self.IMG_FLAGS = pg.HWSURFACE
+
+        # Glyph images, one per layer, keyed by (size, layers, char),
+        # least recently used first
+        self._glyphs = OrderedDict()
+        self.glyph_cache_size = glyph_cache_size
+        # Whole rendered strings, least recently used first
+        self._strings = OrderedDict()
+        self.string_cache_size = string_cache_size
         
     def _add_fontsize(self, filename, size):
         """ Add a font size renderer to _font_sizes. """
@@ -139,7 +162,99 @@ class FontRenderer(object):
         return img.convert(self.DISPLAY_BITDEPTH, self.IMG_FLAGS)
 
     def render(self, text, size, bg_color, bg_transparent, layers):
-        """ Render text through the defined layers. """
+        """ Render text through the defined layers.
+
+        Return a new surface, it can be modified freely.
+        """
+
+        key = (text, size, bg_color, bg_transparent, _layers_key(layers))
+        try:
+            img = self._strings.pop(key)
+        except KeyError:
+            img = None
+            if self._glyph_layers(layers):
+                img = self._render_glyphs(text, size, bg_color, bg_transparent, layers, key[4])
+            if img is None:
+                img = self._render_text(text, size, bg_color, bg_transparent, layers)
+            if len(self._strings) >= self.string_cache_size:
+                self._strings.popitem(last=False)
+        self._strings[key] = img
+
+        return img.copy()
+
+    def _glyph_layers(self, layers):
+        """ Return True if text with the layers can be assembled from
+        glyphs. """
+        for fun, args in layers:
+            if fun in self.NOT_GLYPH_LAYERS:
+                return False
+            # The images of a glyph would cover the ones of the next
+            # glyph in other order than in the whole text
+            if fun == 'shadows' and len(args['positions_and_colors']) > 1:
+                return False
+            if fun == 'external_border' and self.antialias:
+                return False
+        return True
+
+    def _glyph(self, char, size, layers, layers_key):
+        """ Return a list with the images of char for every layer. """
+        key = (size, layers_key, char)
+        try:
+            images = self._glyphs.pop(key)
+        except KeyError:
+            pixel_size = self.size(char, size, layers)
+            wo_effects_ps = self[size].size(char)
+            offset = ((pixel_size[0] - wo_effects_ps[0]) / 2,
+                      (pixel_size[1] - wo_effects_ps[1]) / 2)
+            images = [getattr(self, '_' + fun)(char, size, pixel_size, offset, **args) for fun, args in layers]
+            if len(self._glyphs) >= self.glyph_cache_size:
+                self._glyphs.popitem(last=False)
+        self._glyphs[key] = images
+        return images
+
+    def _render_glyphs(self, text, size, bg_color, bg_transparent, layers, layers_key):
+        """ Render text blitting the cached glyphs.
+
+        Return None if that wouldn't give the same image as rendering
+        the whole text.
+        """
+
+        font = self[size]
+        metrics = font.metrics(text)
+        if not text or None in metrics:
+            return None
+
+        # Kerning or something else moves the chars, the width of a
+        # pair can't hide it behind the overhang of other char
+        origins, width = _layout(metrics)
+        if width != font.size(text)[0]:
+            return None
+        for i in xrange(len(text) - 1):
+            if _layout(metrics[i:i + 2])[1] != font.size(text[i:i + 2])[0]:
+                return None
+
+        # A char is moved right in its image if it starts before its
+        # origin, the whole text only by the first char
+        shift = max(0, -metrics[0][0])
+        positions = [shift + origin - max(0, -m[0])
+                     for origin, m in zip(origins, metrics)]
+
+        pixel_size = self.size(text, size, layers)
+        result = self._get_new_surface(text, pixel_size)
+        result.fill(bg_color)
+        if bg_transparent:
+            result.set_colorkey(bg_color)
+
+        # Blit all the glyphs of a layer before going for the next one
+        glyphs = [self._glyph(char, size, layers, layers_key) for char in text]
+        for i in xrange(len(layers)):
+            for x, images in zip(positions, glyphs):
+                result.blit(images[i], (x, 0))
+
+        return result
+
+    def _render_text(self, text, size, bg_color, bg_transparent, layers):
+        """ Render the whole text through the defined layers. """
         
         pixel_size = self.size(text, size, layers)
         wo_effects_ps = self[size].size(text)
@@ -216,16 +331,36 @@ class FontRenderer(object):
         return s
 
     def _external_border(self, text, size, pixel_size, offset, width = None, color = None):
-        """ Add an external border (outside of the font). """
+        """ Add an external border (outside of the font).
+
+        The text is rendered only once and dilated a square of side
+        2*width+1, first along the rows and then along the columns.
+        """
         
         wo_effects_ps = self[size].size(text)
         offset = ((pixel_size[0] - wo_effects_ps[0]) / 2, 
                   (pixel_size[1] - wo_effects_ps[1]) / 2)
-        l = []
-        for x, y in product(xrange(-width, width+1, 1),xrange(-width, width+1, 1)):
-            l.append( ((x,y),color) )
-        
-        return self._shadows(text, size, pixel_size, offset, l)
+
+        if self.antialias:
+            # Antialiased pixels aren't all the same color, the order
+            # of the blits matters, do it the slow way
+            l = []
+            for x, y in product(xrange(-width, width+1, 1),xrange(-width, width+1, 1)):
+                l.append( ((x,y),color) )
+            return self._shadows(text, size, pixel_size, offset, l)
+
+        transparent = self.TRANSPARENT
+        text_img = self._render_internal(text, size, color, transparent)
+        text_img.set_colorkey(transparent)
+
+        rows = self._get_new_surface(text, pixel_size)
+        for x in xrange(-width, width+1, 1):
+            rows.blit(text_img, (offset[0] + x, offset[1]))
+
+        s = self._get_new_surface(text, pixel_size)
+        for y in xrange(-width, width+1, 1):
+            s.blit(rows, (0, y))
+        return s
     
     def _internal_border(self, text, size, pixel_size, offset, color = None):
         """ Add an internal border (inside of the font). """
@@ -245,3 +380,27 @@ class FontRenderer(object):
         result.blit(temp, (0,0))
         result.set_colorkey(BG)
         return result
+
+
+def _layout(metrics):
+    """ Return the origins of the chars placed by their advances and
+    the width they need, as the font measures it. """
+    origins = []
+    x = left = right = 0
+    for minx, maxx, miny, maxy, advance in metrics:
+        origins.append(x)
+        left = min(left, x + minx)
+        right = max(right, x + max(maxx, advance))
+        x += advance
+    return origins, right - left
+
+def _freeze(value):
+    """ Return a hashable version of a layer argument. """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _layers_key(layers):
+    """ Return a hashable key for a list of layers. """
+    return tuple((fun, tuple(sorted((k, _freeze(v)) for k, v in args.items())))
+                 for fun, args in layers)
@@ -116,6 +116,85 @@ Python-based multi-media and game development libraries.
 
 import sys
 import time
+from heapq import heapify, heappush, heappop
+from itertools import count
+
+
+def _monotonic_clock():
+    """Return the best monotonic high resolution time source available."""
+    try:
+        return time.monotonic
+    except AttributeError:
+        pass
+    if sys.platform in ('win32','cygwin'):
+        # QueryPerformanceCounter
+        return time.clock
+    if sys.platform.startswith('linux'):
+        try:
+            import ctypes, ctypes.util
+            class timespec(ctypes.Structure):
+                _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+            librt = ctypes.CDLL(ctypes.util.find_library('rt') or 'librt.so.1')
+            clock_gettime = librt.clock_gettime
+            clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+            CLOCK_MONOTONIC = 1
+            ts = timespec()
+            ts_ref = ctypes.byref(ts)
+            def monotonic():
+                clock_gettime(CLOCK_MONOTONIC, ts_ref)
+                return ts.tv_sec + ts.tv_nsec * 1e-9
+            monotonic()
+            return monotonic
+        except (OSError, AttributeError):
+            pass
+    return time.time
+
+monotonic = _monotonic_clock()
+
+
+class LatenessHistogram(object):
+    """Histogram of how late the frames were, in bins of bin_size seconds.
+    
+    Frames later than bins*bin_size are counted in the last bin.
+    """
+    def __init__(self, bin_size=0.00025, bins=80):
+        self.bin_size = bin_size
+        self.counts = [0] * bins
+        self.total = 0
+        self.max_lateness = 0.0
+    
+    def record(self, lateness):
+        if lateness < 0.0:
+            lateness = 0.0
+        i = int(lateness / self.bin_size)
+        if i >= len(self.counts):
+            i = len(self.counts) - 1
+        self.counts[i] += 1
+        self.total += 1
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+    
+    def percentile(self, p):
+        """Return the upper edge of the bin holding the percentile p (0-100)."""
+        if not self.total:
+            return 0.0
+        needed = self.total * p / 100.0
+        seen = 0
+        for i,n in enumerate(self.counts):
+            seen += n
+            if n and seen >= needed:
+                return (i + 1) * self.bin_size
+        return len(self.counts) * self.bin_size
+    
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.total = 0
+        self.max_lateness = 0.0
+    
+    def __str__(self):
+        return 'frames=%d p50=%.2fms p95=%.2fms p99=%.2fms max=%.2fms' % (
+            self.total, self.percentile(50)*1000, self.percentile(95)*1000,
+            self.percentile(99)*1000, self.max_lateness*1000)
 
 class _Item(object):
     """A spammy item runs all the time."""
@@ -128,13 +207,14 @@ class _Item(object):
 
 class _IntervalItem(object):
     """An interval item runs after an elapsed interval."""
-    __slots__ = ['func', 'interval', 'lasttime', 'args', 'kwargs']
+    __slots__ = ['func', 'interval', 'lasttime', 'args', 'kwargs', 'cancelled']
     def __init__(self, func, interval, curtime, args, kwargs):
         self.func = func
         self.interval = float(interval)
         self.lasttime = curtime
         self.args = args
         self.kwargs = kwargs
+        self.cancelled = False
     def sort_key(self):
         return self.lasttime+self.interval
 
@@ -163,6 +243,10 @@ class GameClock(object):
             ready.
         time_source -> Callable. Custom time source, e.g.
             lambda:pygame.time.get_ticks() / 1000.0.
+        precise_wait -> Boolean. When True and use_wait is True, sleep until
+            spin_time seconds before the frame is due and busy wait the rest,
+            using a monotonic high resolution clock if time_source is None.
+        spin_time -> Float. Seconds of busy wait for precise_wait.
     Properties:
         interpolate -> Read-only. Float (range 0 to 1) factor representing the
             exact point in time between the previous and next ticks.
@@ -188,6 +272,8 @@ class GameClock(object):
         max_fps -> Read-write. See parameter max_fps.
         use_wait -> Read-write. See parameter use_wait.
         max_frame_skip -> Read-write. See parameter max_frame_skip.
+        lateness -> LatenessHistogram of how late the frames were when max_fps
+            is not zero.
     Methods:
         tick() -> Game loop timer. Call once per game loop.
         get_time() -> Return the milliseconds elapsed in the previous call to tick().
@@ -202,11 +288,16 @@ class GameClock(object):
     def __init__(self,
         ticks_per_second=25, max_fps=0, use_wait=True, max_frame_skip=5,
         update_callback=None, frame_callback=None, time_source=None,
+        precise_wait=False, spin_time=0.002,
     ):
         # time sources
         self._wait = time.sleep
+        self.precise_wait = precise_wait
+        self.spin_time = spin_time
         if time_source is not None:
             self._get_ticks = time_source
+        elif precise_wait:
+            self._get_ticks = monotonic
         elif sys.platform in ('win32','cygwin'):
             self._get_ticks = time.clock
         else:
@@ -233,14 +324,17 @@ class GameClock(object):
         self._last_frame = self.time
         
         # schedules: trigger once per call to tick()
-        # interval schedules: trigger on elapsed time
+        # interval schedules: trigger on elapsed time, it's a heap of
+        #     (sort_key, order, item), unscheduled items stay in it marked
+        #     as cancelled until they get to the top
         # update schedules: trigger on update_ready
         # frames schedules: trigger on frame_ready
         self.schedules = []
         self.interval_schedules = []
         self.update_schedules = []
         self.frame_schedules = []
-        self._need_sort = False  # for interval schedules only
+        self._interval_items = {}   # func -> interval item
+        self._interval_order = count()
         
         # stats
         self.tps = 0.0      # calls to tick() per second
@@ -250,6 +344,7 @@ class GameClock(object):
         self.frame_elapsed = 0.0
         self.update_ready = True
         self.frame_ready = True
+        self.lateness = LatenessHistogram()
         
     @property
     def ticks_per_second(self):
@@ -325,38 +420,51 @@ class GameClock(object):
         if TIME >= self._last_update+self._tick_step*self.dilation:
             self.update_ready = True
         
+        frame_due = self._last_frame + self._frame_step
         if self.max_fps == 0:
             self.frame_ready = True
-        elif TIME >= self._last_frame+self._frame_step or \
+        elif TIME >= frame_due or \
             self._frames_skipped >= self.max_frame_skip:
             self.frame_ready = True
+            self.lateness.record(TIME - frame_due)
         elif self._use_wait and self.max_fps > 0:
-            wait_sec = self._last_frame + self._frame_step - self._get_ticks()
-            if wait_sec > 0.:
-                self._wait(wait_sec)
+            if self.precise_wait:
+                self._wait_until(frame_due)
+            else:
+                wait_sec = frame_due - self._get_ticks()
+                if wait_sec > 0.:
+                    self._wait(wait_sec)
             self.frame_ready = True
+            self.lateness.record(self._get_ticks() - frame_due)
         
         # Schedules cycled every tick.
         for sched in self.schedules:
             sched.func(DT, *sched.args, **sched.kwargs)
         
-        # Schedules cycled when their interval elapses.
-        if self._need_sort:
-            self.interval_schedules.sort(key=_IntervalItem.sort_key)
-        self.need_sort = False
-        for sched in self.interval_schedules:
+        # Schedules cycled when their interval elapses. Every item runs
+        # once per tick at most, so they are pushed back after the loop.
+        heap = self.interval_schedules
+        fired = []
+        while heap:
+            sched = heap[0][2]
+            if sched.cancelled:
+                heappop(heap)
+                continue
             due = sched.lasttime + sched.interval*self.dilation
-            if TIME >= due:
-                drift = TIME - due
-                if -0.5 < drift < 0.5:
-                    dt = sched.interval
-                else:
-                    dt = TIME - sched.lasttime
-                sched.func(dt/self.dilation, *sched.args, **sched.kwargs)
-                sched.lasttime += dt * self.dilation
-                self._need_sort = True
-            else:
+            if TIME < due:
                 break
+            heappop(heap)
+            fired.append(sched)
+            drift = TIME - due
+            if -0.5 < drift < 0.5:
+                dt = sched.interval
+            else:
+                dt = TIME - sched.lasttime
+            sched.func(dt/self.dilation, *sched.args, **sched.kwargs)
+            sched.lasttime += dt * self.dilation
+        for sched in fired:
+            if not sched.cancelled:
+                heappush(heap, (sched.sort_key(), next(self._interval_order), sched))
         
         # Schedules cycled every update.
         if self.update_ready:
@@ -411,6 +519,15 @@ class GameClock(object):
         
         return DT
     
+    def _wait_until(self, due):
+        """Sleep until spin_time before due, then busy wait."""
+        get_ticks = self._get_ticks
+        sleep_sec = due - get_ticks() - self.spin_time
+        if sleep_sec > 0.:
+            self._wait(sleep_sec)
+        while get_ticks() < due:
+            pass
+    
     @property
     def interpolate(self):
         """Return a float representing the current position in between the
@@ -489,18 +606,26 @@ class GameClock(object):
         """
         self.unschedule(func)
         item = _IntervalItem(func, interval, self._get_ticks(), args, kwargs)
-        self.interval_schedules.append(item)
-        self._need_sort = True
+        self._interval_items[func] = item
+        heappush(self.interval_schedules,
+            (item.sort_key(), next(self._interval_order), item))
     
     def unschedule(self, func):
         """Unschedule a managed function."""
         for sched in (
             self.schedules, self.update_schedules, self.frame_schedules,
-            self.interval_schedules,
         ):
             for item in list(sched):
                 if item.func == func:
                     sched.remove(item)
+        item = self._interval_items.pop(func, None)
+        if item is not None:
+            item.cancelled = True
+            # Drop the cancelled items if they are most of the heap.
+            heap = self.interval_schedules
+            if len(heap) > 2 * len(self._interval_items) + 16:
+                heap[:] = [entry for entry in heap if not entry[2].cancelled]
+                heapify(heap)
     
 if __name__ == '__main__':
     """
@@ -21,16 +21,23 @@
 
 # TODO: Overhaul this... it's outdated/ugly
 
-from os.path import join, dirname
+from os.path import join, dirname, exists, getmtime
+from collections import OrderedDict
 from math import ceil
+from itertools import product
+from time import time
+import sys
+import threading
+import weakref
 
 import pygame
 import pytmx
 
 import actionsprite
+import levelcache
 from aparser import ArgumentParser
 from sprites import ImageSprite, TryGroup
-from utils import extend_dict
+from utils import extend_dict, load_image
 from quadtree import QuadTree
 import constants as c
 import settings as s
@@ -53,11 +60,21 @@ class UnknownPlatformType(Exception):
 
 class Map(object):
     """ Loads a Tiled map and gives some tools to work with it """
-    def __init__(self, filename):
+    def __init__(self, filename, preloaded=None, lazy_objects=None, built_layers=None):
+        """ preloaded is the result of a MapPreloader, if not given
+        the map is loaded now. built_layers has the tile and image
+        layers it has already built, by index in the layers of the map.
+
+        With lazy_objects the objects of the map are created the first
+        time they are inside the region given to activate_objects(),
+        by default it's settings.lazy_objects.
+        """
         # load it using pytmx
-        from pytmx import tmxloader
         self.path = filename
-        self.tiledmap = tmxloader.load_pygame(filename, force_colorkey = PINK_TRANSPARENT)
+        if preloaded:
+            self.tiledmap, baked_layers, cached = preloaded
+        else:
+            self.tiledmap, baked_layers, cached = load_tiledmap(filename)
         self.spritesheet = self.tiledmap.tilesets[0].source
         
         # some useful variables
@@ -100,33 +117,46 @@ class Map(object):
 
         self.debugging = False
 
+        # Static part of the map drawn by the MapPreloader, None if the
+        # renderer has to draw it
+        self.background = None
+
         # get all the layers!
+        if built_layers is None:
+            built_layers = {}
         all_tiled_layers = self.tiledmap.all_layers
         for layer in range(len(all_tiled_layers)):
             tiledlayer = all_tiled_layers[layer]
             
-            if tiledlayer in self.tiledmap.tilelayers:
-                tile_layer_index = self.tiledmap.tilelayers.index(tiledlayer)
-                if hasattr(tiledlayer, 'Collision'):
-                    new_layer = NewCollisionLayer(self.tiledmap, tile_layer_index)
-                else:
-                    new_layer = TileLayer(self.tiledmap, tile_layer_index)
-                
-            elif tiledlayer in self.tiledmap.imagelayers:
-                index = self.tiledmap.imagelayers.index(tiledlayer)
-                new_layer = ImageLayer(self.tiledmap, index)
-                
+            if layer in built_layers:
+                new_layer = built_layers[layer]
+
             elif tiledlayer in self.tiledmap.objectgroups:
                 index = self.tiledmap.objectgroups.index(tiledlayer)
-                new_layer = ObjectLayer(self.tiledmap, index)
+                if lazy_objects is None:
+                    lazy_objects = s.lazy_objects
+                new_layer = ObjectLayer(self.tiledmap, index, lazy_objects)
+
+            else:
+                new_layer = build_layer(self.tiledmap, tiledlayer, baked_layers)
             
             self.layers.append(new_layer)
 
+        if s.level_cache and not cached:
+            levelcache.save(filename, self.tiledmap, baked_layers)
+
         # final loop to collect all the layer info
         for layer in self.layers:
             if isinstance(layer, ObjectLayer):
                 self.get_info_object_layer(layer)
-            elif isinstance(layer, NewCollisionLayer):
+
+        self.build_collision_tree()
+
+    def build_collision_tree(self):
+        """ Collect the collision sprites and put them in a QuadTree. """
+        self.collision_group.empty()
+        for layer in self.layers:
+            if isinstance(layer, NewCollisionLayer):
                 #~ self.collision_group.add(layer.collision)
                 self.collision_group.add(layer.static)
 
@@ -145,12 +175,362 @@ class Map(object):
         extend_dict(self.player_spawns, layer.player_spawns)
         self.cameras.extend(layer.cameras)
 
+    def reload(self, tilesets_changed=()):
+        """ Load the map file again keeping what hasn't changed.
+
+        Only the tile and image layers whose data or properties have
+        changed are built again, all the tile layers if any tileset in
+        the list tilesets_changed has changed. Objects are compared by
+        their properties, removed ones are killed and new ones created.
+        Players and objects with cameras are never touched, so they keep
+        their state.
+
+        Return a tuple with the list of new sprites and True if the
+        static layers have changed. Return None if the map has a
+        different size or different layers, it has to be loaded again.
+
+        """
+        from pytmx import tmxloader
+
+        # The asset cache would give back the old images
+        for filename in tilesets_changed:
+            load_image.discard(filename)
+
+        old = self.tiledmap
+        new = tmxloader.load_pygame(self.path, force_colorkey = PINK_TRANSPARENT, load_image = load_image)
+
+        if (old.width, old.height, old.tilewidth, old.tileheight) != \
+           (new.width, new.height, new.tilewidth, new.tileheight) or \
+           _layers_signature(old) != _layers_signature(new):
+            return None
+
+        self.tiledmap = new
+        new_sprites = []
+        background_changed = False
+        collision_changed = False
+        for i, (old_layer, tiledlayer) in enumerate(zip(old.all_layers, new.all_layers)):
+            layer = self.layers[i]
+            if isinstance(layer, ObjectLayer):
+                new_sprites.extend(layer.reload_objects(new, new.objectgroups.index(tiledlayer)))
+                continue
+
+            if _layer_properties(old_layer) == _layer_properties(tiledlayer):
+                if isinstance(layer, ImageLayer):
+                    continue
+                if not tilesets_changed and \
+                   _tiled_gids(old, old_layer) == _tiled_gids(new, tiledlayer):
+                    continue
+
+            if isinstance(layer, ImageLayer):
+                new_layer = ImageLayer(new, new.imagelayers.index(tiledlayer))
+            else:
+                index = new.tilelayers.index(tiledlayer)
+                if hasattr(tiledlayer, 'Collision'):
+                    new_layer = NewCollisionLayer(new, index)
+                else:
+                    new_layer = TileLayer(new, index)
+                if isinstance(layer, NewCollisionLayer) or \
+                   isinstance(new_layer, NewCollisionLayer):
+                    collision_changed = True
+            self.layers[i] = new_layer
+            background_changed = True
+
+        if collision_changed:
+            self.build_collision_tree()
+
+        if new_sprites:
+            actions = [i for i in new_sprites if isinstance(i, actionsprite.ActionSprite)]
+            mobs = [i for i in new_sprites if not isinstance(i, actionsprite.ActionSprite)]
+            self.actionsprites.add(actions)
+            self.mobs.add(mobs)
+            self.hostiles.add([i for i in mobs if i.hostile])
+            new_sprites = mobs
+
+        return new_sprites, background_changed
+
+    def activate_objects(self, rect):
+        """ Create the lazy objects inside rect, all of them if rect
+        is None. Return a list with the new sprites. """
+        new = []
+        for layer in self.layers:
+            if isinstance(layer, ObjectLayer) and layer.pending_objects:
+                new.extend(layer.activate(rect))
+
+        if new:
+            self.mobs.add(new)
+            self.hostiles.add([i for i in new if i.hostile])
+        return new
+
+    def count_pending(self, cls):
+        """ Return how many objects of the class cls are not created. """
+        return sum(layer.count_pending(cls) for layer in self.layers
+                   if isinstance(layer, ObjectLayer))
+
     def dprint(self,text):
         if self.debugging:
             print text
 
 
 
+def _layers_signature(tiledmap):
+    """ Kind and name of all the layers of a TiledMap. """
+    return [(type(layer).__name__, layer.name) for layer in tiledmap.all_layers]
+
+
+def _layer_properties(tiledlayer):
+    """ Properties of a pytmx layer, without its data. """
+    return dict((k, v) for k, v in tiledlayer.__dict__.iteritems()
+                if k not in ('parent', 'data'))
+
+
+def _tiled_gids(tiledmap, tiledlayer):
+    """ Gids and flags of the Tiled file of a tile layer by row.
+
+    The internal gids of pytmx are numbered in order of appearance, so
+    the same tile can have different gids in two loads of a map.
+
+    """
+    tiled = dict((value[0], key) for key, value in tiledmap.imagemap.iteritems()
+                 if isinstance(value, tuple))
+    tiled[0] = (0, 0)
+    return [[tiled[gid] for gid in row] for row in tiledlayer.data]
+
+
+def _object_key(obj):
+    """ Key to compare pytmx objects between reloads. """
+    return repr(sorted((k, v) for k, v in obj.__dict__.iteritems()
+                       if k != 'parent'))
+
+
+class MapWatcher(object):
+    """ Poll the modification time of a map and its tilesets.
+
+    Files are checked every interval seconds, it's cheap enough to ask
+    changed() every update.
+
+    """
+
+    def __init__(self, level, interval=1.0):
+        self.interval = interval
+        self.next_check = time() + interval
+        self.watch(level)
+
+    def watch(self, level):
+        """ Start watching the files of the level. """
+        files = levelcache.map_sources(level.path, level.tiledmap)
+        self.map_file = level.path
+        self.mtimes = dict((f, self._mtime(f)) for f in files)
+
+    def _mtime(self, filename):
+        return getmtime(filename) if exists(filename) else None
+
+    def changed(self):
+        """ Return the list of files changed since the last call. """
+        now = time()
+        if now < self.next_check:
+            return []
+        self.next_check = now + self.interval
+
+        changed = []
+        for f, mtime in self.mtimes.iteritems():
+            new_mtime = self._mtime(f)
+            if new_mtime != mtime:
+                self.mtimes[f] = new_mtime
+                changed.append(f)
+        return changed
+
+
+# Converted tile images, by pytmx tile image and layer opacity. All the
+# placements of a tile share the same surface.
+_converted_tiles = weakref.WeakKeyDictionary()
+
+def converted_tile(tile_img, opacity):
+    """ Return the tile image ready to be blitted with the given opacity.
+
+    The image is converted only the first time, don't modify it.
+
+    """
+    try:
+        by_opacity = _converted_tiles[tile_img]
+    except KeyError:
+        by_opacity = _converted_tiles[tile_img] = {}
+
+    try:
+        return by_opacity[opacity]
+    except KeyError:
+        img = tile_img.convert()
+        img.set_colorkey(PINK_TRANSPARENT)
+        # Apply layer opacity
+        if opacity != 1.0:
+            img.set_alpha(ceil(opacity*255))
+        by_opacity[opacity] = img
+        return img
+
+
+def build_layer(tiledmap, tiledlayer, baked_layers):
+    """ Return the layer of a tile or image layer of the map.
+
+    Tile layers use their pre-rendered image in baked_layers if it's
+    there, and put it there if not.
+
+    """
+    if tiledlayer in tiledmap.imagelayers:
+        return ImageLayer(tiledmap, tiledmap.imagelayers.index(tiledlayer))
+
+    index = tiledmap.tilelayers.index(tiledlayer)
+    if hasattr(tiledlayer, 'Collision'):
+        return NewCollisionLayer(tiledmap, index)
+    layer = TileLayer(tiledmap, index, baked_layers.get(index))
+    baked_layers[index] = layer.static_img
+    return layer
+
+
+def draw_static_layer(layer, surface):
+    """ Draw a tile or image layer in surface if it's visible. """
+    if layer.visible:
+        if isinstance(layer, ImageLayer):
+            layer.draw(surface)
+        elif isinstance(layer, TileLayer):
+            # TODO
+            # animated tiles need som special treatment too
+            surface.blit(layer.static_img, (0,0))
+
+
+def load_tiledmap(filename):
+    """ Load a tmx map using the level cache if possible.
+
+    Return the TiledMap, a dict with the pre-rendered static tile
+    layers by tile layer index and True if it was loaded from the
+    cache.
+
+    """
+    from pytmx import tmxloader
+
+    cached = levelcache.load(filename) if s.level_cache else None
+    if cached:
+        tiledmap, baked_layers = cached
+        tmxloader.load_images_pygame(tiledmap, None, force_colorkey = PINK_TRANSPARENT, load_image = load_image)
+        return tiledmap, baked_layers, True
+
+    tiledmap = tmxloader.load_pygame(filename, force_colorkey = PINK_TRANSPARENT, load_image = load_image)
+    return tiledmap, {}, False
+
+
+def bake_map(filename):
+    """ Write the level cache for a map.
+
+    Only parses the map and renders the static tile layers, objects
+    are not created. Needs an initialized display.
+
+    """
+    tiledmap, baked_layers, cached = load_tiledmap(filename)
+    if cached:
+        return False
+
+    for index, tiledlayer in enumerate(tiledmap.tilelayers):
+        if not hasattr(tiledlayer, 'Collision'):
+            baked_layers[index] = TileLayer(tiledmap, index).static_img
+    levelcache.save(filename, tiledmap, baked_layers)
+    return True
+
+
+class MapPreloader(object):
+    """ Load a map in the background.
+
+    The tmx file (or its level cache) is parsed in a worker thread. The
+    rest of the work creates pygame surfaces, that has to be done in the
+    main thread and is done by small pieces calling step() every frame:
+    the tile images, the tile and image layers and the static part of
+    the map. get_map() finishes the work, if needed, and returns the
+    Map.
+
+    The objects are created by get_map(), when the scene has set the
+    random seed.
+
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.finished = False
+        self._parsed = None
+        self._error = None
+        self._result = None
+        self._layers = None
+        self._background = None
+        self._steps = self._convert()
+
+        self._thread = threading.Thread(target=self._parse)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _parse(self):
+        """ Worker thread, it can't touch any surface. """
+        try:
+            cached = levelcache.read(self.filename) if s.level_cache else None
+            if cached:
+                tiledmap, layers = cached
+                self._parsed = tiledmap, layers, True
+            else:
+                self._parsed = pytmx.TiledMap(self.filename), {}, False
+        except Exception:
+            self._error = sys.exc_info()
+
+    def _convert(self):
+        """ Generator doing the main thread work, a piece every time. """
+        from pytmx import tmxloader
+
+        if self._error:
+            raise self._error[0], self._error[1], self._error[2]
+
+        tiledmap, layers, cached = self._parsed
+        for i in tmxloader.iter_load_images_pygame(tiledmap, None, force_colorkey = PINK_TRANSPARENT, load_image = load_image):
+            yield
+        for index, (size, pixels) in layers.items():
+            layers[index] = levelcache.layer_surface(size, pixels)
+            yield
+
+        built = {}
+        for i, tiledlayer in enumerate(tiledmap.all_layers):
+            if tiledlayer not in tiledmap.objectgroups:
+                built[i] = build_layer(tiledmap, tiledlayer, layers)
+                yield
+
+        # As LayeredRenderer.render_map_background draws it
+        background = pygame.Surface((tiledmap.width * tiledmap.tilewidth,
+                                     tiledmap.height * tiledmap.tileheight))
+        for i in sorted(built):
+            draw_static_layer(built[i], background)
+            yield
+
+        self._result = tiledmap, layers, cached
+        self._layers = built
+        self._background = background
+
+    def step(self, max_time):
+        """ Work at most for max_time seconds. Return True when done. """
+        if self.finished:
+            return True
+        if self._thread.is_alive():
+            return False
+
+        end = time() + max_time
+        for i in self._steps:
+            if time() >= end:
+                return False
+        self.finished = True
+        return True
+
+    def get_map(self):
+        """ Return the loaded Map, waiting for the work left. """
+        self._thread.join()
+        for i in self._steps:
+            pass
+        self.finished = True
+        level = Map(self.filename, self._result, built_layers=self._layers)
+        level.background = self._background
+        return level
+
+
 class GenericLayer(object):
     def __init__(self, tiledmap, **args):
         
@@ -190,7 +570,9 @@ class GenericLayer(object):
 
 
 class TileLayer(GenericLayer):
-    def __init__(self, tiledmap, pytmx_index):
+    def __init__(self, tiledmap, pytmx_index, static_img=None):
+        """ static_img is the pre-rendered layer from the level cache,
+        if given the tiles are not read. """
         
         tiled_obj = tiledmap.tilelayers[pytmx_index]
         GenericLayer.__init__(self, tiledmap, **tiled_obj.__dict__)
@@ -204,49 +586,50 @@ class TileLayer(GenericLayer):
         self.static = pygame.sprite.Group()
         self.dynamic = pygame.sprite.Group()
 
-        # read the tiles
-        self.read_layer(tiledmap, pytmx_index)
+        self.map_size_in_pixels = (self.tilewidth*self.width,self.tileheight*self.height)
+        if static_img is not None:
+            self.static_img = static_img
+            return
 
         # generate the static image of the layer
-        self.map_size_in_pixels = (self.tilewidth*self.width,self.tileheight*self.height)
         self.static_img = pygame.Surface(self.map_size_in_pixels,pygame.HWSURFACE | pygame.SRCALPHA)
         self.static_img.fill((0,0,0,0))
+
+        # read the tiles
+        self.read_layer(tiledmap, pytmx_index)
         self.static.draw(self.static_img)
 
     def read_layer(self, tiledmap, index):
+        """ Read the tiles of the layer.
+
+        Layers with a platform_type get a sprite for every tile in
+        self.static, purely decorative layers are blitted directly in
+        self.static_img.
+        """
 
-        # tile imgs with per pixel alpha modified
-        opacity_mod_tiles = {}
         tiled_obj = tiledmap.tilelayers[index]
-        
-        apply_op = self.apply_opacity
-        add = self.static.add
-
-        # remember, to use these funcions we have to 
-        # use the index from tiledmap.tilelayers
-        get_tile_img = tiledmap.getTileImage
-        get_tile_prop = tiledmap.getTileProperties
-        th = tiledmap.tilewidth
-        tw = tiledmap.tileheight
+        images = tiledmap.images
+        tw = tiledmap.tilewidth
+        th = tiledmap.tileheight
         opacity = self.opacity
-        
+
         # TODO: this is ugly
         if hasattr(self, 'platform_type'):
             platform = self.platform_type
+            add = self.static.add
         else:
-            platform = sprites.Tile
-        
-        for i in range(0, tiledmap.width):
-            for j in range(0, tiledmap.height):
-                tile_img = get_tile_img(i, j, index)
-                tile_prop = get_tile_prop((i, j, index))
+            platform = None
+            blit = self.static_img.blit
+
+        for j, row in enumerate(tiled_obj.data):
+            for i, gid in enumerate(row):
+                tile_img = images[gid]
                 if tile_img:
-                    tile_img = tile_img.convert()
-                    tile_img.set_colorkey(PINK_TRANSPARENT)
-                    # Apply layer opacity
-                    if opacity != 1.0:
-                        tile_img.set_alpha(ceil(opacity*255))
-                    add(platform(tile_img, i*tw, j*th, **tiled_obj.__dict__))
+                    tile_img = converted_tile(tile_img, opacity)
+                    if platform:
+                        add(platform(tile_img, i*tw, j*th, **tiled_obj.__dict__))
+                    else:
+                        blit(tile_img, (i*tw, j*th))
                     # TODO TODO TODO TODO... dynamic tiles!
 
 
@@ -254,6 +637,8 @@ class CollisionLayer(TileLayer):
     def __init__(self, tiledmap, pytmx_index):
         
         tiled_obj = tiledmap.tilelayers[pytmx_index]
+        # needs a sprite per tile to get the coords
+        self.platform_type = sprites.Tile
         TileLayer.__init__(self, tiledmap, pytmx_index)
 
         # list to store the coords and group for the tiles
@@ -385,7 +770,11 @@ class NewCollisionLayer(TileLayer):
 
 
 class ObjectLayer(GenericLayer, TryGroup):
-    def __init__(self, tiledmap, pytmx_index):
+
+    # Size in pixels of the cells of the lazy objects index
+    CELL_SIZE = 128
+
+    def __init__(self, tiledmap, pytmx_index, lazy=False):
         
         tiled_obj = tiledmap.objectgroups[pytmx_index]
         GenericLayer.__init__(self, tiledmap, **tiled_obj.__dict__)
@@ -403,35 +792,172 @@ class ObjectLayer(GenericLayer, TryGroup):
         self.player_spawns = {}
         self.cameras = []
         self.actionsprites = TryGroup()
+
+        # Objects not created yet, in the order of the map (replays need
+        # them always created in the same order), the same objects by
+        # cell and how many of them are of every type
+        self.lazy = lazy
+        self.pending_objects = OrderedDict()
+        self.pending_cells = {}
+        self.pending_types = {}
+        # Sprite of every pytmx object, None if it's still pending
+        self.object_sprites = {}
         
-        self.read_objects(tiled_obj)
+        self.read_objects(tiled_obj, lazy)
 
-    def read_objects(self, tiled_obj):
+    def read_objects(self, tiled_obj, lazy=False):
+        """ Create the objects of the layer.
+
+        If lazy the scripts objects are only stored in the index and
+        created by activate(). Players and objects with cameras are
+        always created.
+        """
         for obj in tiled_obj:
             t = obj.type
             if t in scripts.__dict__:
-                #~ print self.tiledmap.tilesets
-                #~ print self.tiledmap.tilesets[0].source
-                m = scripts.__dict__[obj.type](**obj.__dict__)
-                if obj.type == "Player": self.player_spawns[obj.FromLocation] = m
-                self.add(m)
-                # add cameras
-                if 'Camera' in obj.__dict__:
-                    c_list = obj.Camera.split(',')
-                    for c in c_list:
-                        try:
-                            cm = cameras_dict[c](m)
-                            self.cameras.append(cm)
-                        except:
-                            print "Camera error: The value {0} is not a valid camera.".format(c)
+                if lazy and not self._is_fixed(obj):
+                    self.add_pending(obj)
+                else:
+                    self.create_object(obj)
             
             elif t in actionsprite.__dict__:
-                a = actionsprite.__dict__[obj.type](**obj.__dict__)
-                self.actionsprites.add(a)
+                self.create_action(obj)
             else:
                 print "Warning! Invalid object type: {0}".format(obj.type)
                 pass
 
+    def _is_fixed(self, obj):
+        """ Players and objects with cameras are always created. """
+        return obj.type == "Player" or 'Camera' in obj.__dict__
+
+    def create_action(self, obj):
+        """ Create the action sprite of an object and add it. """
+        a = actionsprite.__dict__[obj.type](**obj.__dict__)
+        self.actionsprites.add(a)
+        self.object_sprites[obj] = a
+        return a
+
+    def reload_objects(self, tiledmap, pytmx_index):
+        """ Compare the objects with the ones of a reloaded map.
+
+        Objects that are no more in the map are killed and the new ones
+        created (or stored as pending). Return a list with the new
+        sprites.
+        """
+        self.tiledmap = tiledmap
+        tiled_obj = tiledmap.objectgroups[pytmx_index]
+
+        old = {}
+        for obj in self.object_sprites:
+            if not self._is_fixed(obj):
+                old.setdefault(_object_key(obj), []).append(obj)
+
+        new = []
+        for obj in tiled_obj:
+            if self._is_fixed(obj):
+                continue
+            same = old.get(_object_key(obj))
+            if same:
+                same.pop()
+            elif obj.type in scripts.__dict__:
+                if self.lazy:
+                    self.add_pending(obj)
+                else:
+                    new.append(self.create_object(obj))
+            elif obj.type in actionsprite.__dict__:
+                new.append(self.create_action(obj))
+
+        # Whatever is left has been removed from the map
+        for objs in old.itervalues():
+            for obj in objs:
+                spr = self.object_sprites.pop(obj)
+                if spr:
+                    spr.kill()
+                else:
+                    self.remove_pending(obj)
+
+        return new
+
+    def create_object(self, obj):
+        """ Create the sprite of a scripts object and add it. """
+        #~ print self.tiledmap.tilesets
+        #~ print self.tiledmap.tilesets[0].source
+        m = scripts.__dict__[obj.type](**obj.__dict__)
+        if obj.type == "Player": self.player_spawns[obj.FromLocation] = m
+        self.add(m)
+        self.object_sprites[obj] = m
+        # add cameras
+        if 'Camera' in obj.__dict__:
+            c_list = obj.Camera.split(',')
+            for c in c_list:
+                try:
+                    cm = cameras_dict[c](m)
+                    self.cameras.append(cm)
+                except:
+                    print "Camera error: The value {0} is not a valid camera.".format(c)
+        return m
+
+    def _object_rect(self, obj):
+        return pygame.Rect(obj.x, obj.y, max(obj.width, 1), max(obj.height, 1))
+
+    def _cells(self, rect):
+        cs = self.CELL_SIZE
+        return product(xrange(rect.left / cs, (rect.right - 1) / cs + 1),
+                       xrange(rect.top / cs, (rect.bottom - 1) / cs + 1))
+
+    def add_pending(self, obj):
+        """ Store an object to be created later. """
+        self.pending_objects[obj] = None
+        self.pending_types[obj.type] = self.pending_types.get(obj.type, 0) + 1
+        self.object_sprites[obj] = None
+        for cell in self._cells(self._object_rect(obj)):
+            self.pending_cells.setdefault(cell, []).append(obj)
+
+    def remove_pending(self, obj):
+        """ Forget a pending object. Its cells are cleaned up by
+        activate(). """
+        del self.pending_objects[obj]
+        self.pending_types[obj.type] -= 1
+
+    def activate(self, rect):
+        """ Create the pending objects touching rect, all of them if
+        rect is None. Return a list with the new sprites. """
+        new = []
+        if rect is None:
+            for obj in self.pending_objects:
+                new.append(self.create_object(obj))
+            self.pending_objects.clear()
+            self.pending_cells.clear()
+            self.pending_types.clear()
+            return new
+
+        pending = self.pending_objects
+        cells = self.pending_cells
+        for cell in self._cells(rect):
+            objs = cells.get(cell)
+            if not objs:
+                continue
+            keep = []
+            for obj in objs:
+                # It can be already created from other cell
+                if obj not in pending:
+                    continue
+                if rect.colliderect(self._object_rect(obj)):
+                    self.remove_pending(obj)
+                    new.append(self.create_object(obj))
+                else:
+                    keep.append(obj)
+            if keep:
+                cells[cell] = keep
+            else:
+                del cells[cell]
+        return new
+
+    def count_pending(self, cls):
+        """ Return how many pending objects are of the class cls. """
+        return sum(n for t, n in self.pending_types.iteritems()
+                   if issubclass(scripts.__dict__[t], cls))
+
 class ImageLayer(GenericLayer, TryGroup):
 
     def __init__(self, tiledmap, pytmx_index):
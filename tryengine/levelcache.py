@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#   This file is part of TryEngine.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" Precompiled cache of the Tiled maps.
+
+Parsing a tmx file and rendering its static layers is slow, so the
+result is stored in a cache file per map. The cache holds the parsed
+TiledMap (gid arrays, tile properties and object definitions, without
+images) and the pixels of the pre-rendered static tile layers.
+
+A cache file is valid while the tmx file and its tileset images are
+the same. Every source is stored with its mtime and md5 digest, if the
+mtime changes the digest is checked, so touching a file doesn't
+invalidate the cache, the new mtime is stored then.
+
+The cache is optional: if it can't be written, for example in a read
+only install, a warning is printed and the maps are parsed every time.
+
+"""
+
+import cPickle as pickle
+from hashlib import md5
+from os import makedirs
+from os.path import join, dirname, basename, exists, getmtime, isdir, normpath
+
+import pygame
+
+import settings as s
+
+# Change it every time the format of the cache changes
+CACHE_VERSION = 2
+
+
+def cache_path(filename):
+    """ Return the path of the cache file for the given map.
+
+    Maps with the same name in different directories have different
+    cache files.
+
+    """
+    # The same in every system, for baked caches
+    path_digest = md5(normpath(filename).replace('\\', '/')).hexdigest()[:8]
+    return join(s.level_cache_dir,
+                "{0}-{1}.cache".format(basename(filename), path_digest))
+
+
+def file_digest(filename):
+    """ Return the md5 hex digest of a file. """
+    h = md5()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), ''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def map_sources(filename, tiledmap):
+    """ Return the list of files the map is built from. """
+    d = dirname(filename)
+    return [filename] + [join(d, t.source) for t in tiledmap.tilesets]
+
+
+def _sources_info(sources):
+    return dict((f, (getmtime(f), file_digest(f))) for f in sources)
+
+
+def _sources_match(sources_info):
+    """ Return a tuple: True if none of the sources have changed and
+    True if only their mtimes have, then sources_info has the new
+    ones. """
+    touched = False
+    for f, (mtime, digest) in sources_info.items():
+        if not exists(f):
+            return False, False
+        new_mtime = getmtime(f)
+        if new_mtime != mtime:
+            if file_digest(f) != digest:
+                return False, False
+            sources_info[f] = (new_mtime, digest)
+            touched = True
+    return True, touched
+
+
+def _write(path, data):
+    """ Write the data to a cache file, return False if it can't. """
+    try:
+        if not isdir(dirname(path)):
+            makedirs(dirname(path))
+        with open(path, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+    except (IOError, OSError), e:
+        print "Warning! Can't write the level cache {0}: {1}".format(path, e)
+        return False
+    return True
+
+
+def read(filename):
+    """ Read the cache file of a map without creating any surface.
+
+    Return a tuple with the TiledMap (without images) and a dict with
+    the size and pixels of the static layers, by tile layer index.
+    Return None if there is no valid cache for the map. It's safe to
+    call it from other thread.
+
+    """
+    path = cache_path(filename)
+    if not exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except Exception, e:
+        print "Warning! Can't read the level cache {0}: {1}".format(path, e)
+        return None
+
+    if data.get('version') != CACHE_VERSION:
+        return None
+    match, touched = _sources_match(data['sources'])
+    if not match:
+        return None
+    # Don't compute the digests again next time
+    if touched:
+        _write(path, data)
+
+    return data['tiledmap'], data['layers']
+
+
+def layer_surface(size, pixels):
+    """ Return the surface of a static layer read from the cache. """
+    return pygame.image.fromstring(pixels, size, "RGBA").convert_alpha()
+
+
+def load(filename):
+    """ Load the cache file of a map.
+
+    Return a tuple with the TiledMap (without images) and a dict with
+    the surfaces of the static layers, by tile layer index. Return None
+    if there is no valid cache for the map.
+
+    """
+    cached = read(filename)
+    if cached is None:
+        return None
+
+    tiledmap, layers = cached
+    layers = dict((index, layer_surface(size, pixels))
+                  for index, (size, pixels) in layers.iteritems())
+
+    return tiledmap, layers
+
+
+def save(filename, tiledmap, layers):
+    """ Write the cache file of a map.
+
+    layers is a dict with the surfaces of the static tile layers by
+    tile layer index.
+
+    """
+    path = cache_path(filename)
+
+    # Images are loaded again from the tilesets, don't store them
+    images = tiledmap.images
+    tiledmap.images = []
+    try:
+        data = {
+            'version': CACHE_VERSION,
+            'sources': _sources_info(map_sources(filename, tiledmap)),
+            'tiledmap': tiledmap,
+            'layers': dict((index, (img.get_size(), pygame.image.tostring(img, "RGBA")))
+                           for index, img in layers.iteritems()),
+            }
+        _write(path, data)
+    finally:
+        tiledmap.images = images
@@ -26,11 +26,12 @@ parent.
 from math import copysign
 from random import randint
 
-from pygame import event, font
+from pygame import font
 
 import automata
 from sprites import AnimatedSprite, TryMovingSprite
 from animation import SpeedUpdateAnimationPlayer
+from eventbus import bus
 from utils import Timer
 from aparser import ArgumentParser, ErrorParsingArgument
 from constants import *
@@ -280,24 +281,38 @@ class Mob(AnimatedSprite, TryMovingSprite):
             else:
                 self.accel_right()
 
+    def order_left(self):
+        self.moving = True
+        self.accel_left()
+
+    def order_right(self):
+        self.accel_right()
+        self.moving = True
+
+    def order_jump(self):
+        self.jump = True
+
+    def order_use(self):
+        self.using = True
+        self.use_next_frame()
+
+    # What a player controlled mob does for every code of the PLAYER
+    # events
+    player_handlers = {
+        LEFT: order_left,
+        RIGHT: order_right,
+        JUMP: order_jump,
+        USE: order_use,
+        SHOOT: lambda self: self.shoot_next_frame(),
+        RESPAWN: lambda self: self.respawn(),
+        }
+
     def get_events(self):
-        l = event.get(PLAYER)
-        for e in l:
-            if e.code == LEFT:
-                self.moving = True
-                self.accel_left()
-            elif e.code == RIGHT:
-                self.accel_right()
-                self.moving = True
-            elif e.code == JUMP:
-                self.jump = True
-            elif e.code == USE:
-                self.using = True
-                self.use_next_frame()
-            elif e.code == SHOOT:
-                self.shoot_next_frame()
-            elif e.code == RESPAWN:
-                self.respawn()
+        handlers = self.player_handlers
+        for e in bus.get(PLAYER):
+            handler = handlers.get(e.code)
+            if handler:
+                handler(self)
 
     def update(self, platforms, new_sprites_group, player):
         """ Generic mob update function. For a very basic mob you can
@@ -24,10 +24,11 @@ from collections import deque
 
 import pygame
 from pygame.locals import *
+from pygame.event import EventType
 from pygame.key import get_mods
-from pygame.time import get_ticks
 
-from utils import Timer
+from eventbus import bus
+from utils import Timer, timers
 
 """ Possible events:
 QUIT             none
@@ -57,6 +58,12 @@ joystick_events = [JOYAXISMOTION, JOYBALLMOTION, JOYHATMOTION,
 
 input_events = keyboard_events + joystick_events + mouse_events
 
+
+def get_ticks():
+    """ Milliseconds of game time. """
+    return int(timers.time * 1000)
+
+
 class Input(object):
     def __init__(self, tracked_key_mods = KMOD_NONE):
         self.kb_size_last_pressed = 10
@@ -76,6 +83,10 @@ class Input(object):
         
         # keys binded to events or functions
         self.key_bindings = {}
+        # the same bindings by key mods, see index_bindings
+        self.bindings_index = None
+        # keys down now
+        self.kb_held = set()
         
         # keyboard modes
         self.lctrl = False
@@ -88,9 +99,24 @@ class Input(object):
         self.ms_start_times = {}
         self.ms_clicked = {}
         self.click_time = 200
+
+        # record the input or replay it instead of the real one, see
+        # replay.py
+        self.recorder = None
+        self.replay = None
     
     def update(self):
-        self.key_mods = key_mods = get_mods() & self.tracked_key_mods
+        events = bus.get(input_events)
+        if self.replay and not self.replay.finished:
+            # Only quitting is taken from the real input
+            quit = [event for event in events if event.type == pygame.QUIT]
+            key_mods, events = self.replay.next_tick()
+            events.extend(quit)
+        else:
+            key_mods = get_mods() & self.tracked_key_mods
+            if self.recorder:
+                self.recorder.begin_tick(key_mods, events)
+        self.key_mods = key_mods
         
         # TODO del this
         left_control = key_mods & KMOD_LCTRL
@@ -107,17 +133,19 @@ class Input(object):
         # Clear mouse clicks:
         self.ms_clicked = {}
         
-        for event in pygame.event.get(input_events):
+        for event in events:
             ticks = get_ticks()
             # the player just ALT+F4 the game or hit the x in the window
             if event.type == pygame.QUIT:
                 self.quitting = True # The player wants to quit the game
             elif event.type == pygame.KEYDOWN:
                 self.kb_pressed[event.key] = 1
+                self.kb_held.add(event.key)
                 self.kb_last_pressed.append(event.key)
                 
             elif event.type == pygame.KEYUP:
                 self.kb_pressed[event.key] = 0
+                self.kb_held.discard(event.key)
 
             # joystick
             if event.type in joystick_events:
@@ -183,43 +211,86 @@ class Input(object):
                 raise TypeError
 
         if det_fun == None:
-            det_fun = self.delayed_is_pressed
+            det_fun = DELAYED
 
         self.key_bindings[(key, mods)] = (det_fun, fun, det_args)
+        self.bindings_index = None
 
     def unbind_keys(self, key):
         """ Unbind key from all actions. """
 
         # Check if iterable
         try:
-            for k in key:
-                del self.def_keys[k]
+            unbind = set(key)
         except TypeError:
-            del self.def_keys[key]
+            unbind = set((key,))
 
-    def run_bindings(self):
-        """ Iterate all the bindings and run functions/post events. """
+        for keys, mods in self.key_bindings.keys():
+            binded = set(keys) if isinstance(keys, tuple) else set((keys,))
+            if binded & unbind:
+                del self.key_bindings[(keys, mods)]
+        self.bindings_index = None
+
+    def index_bindings(self):
+        """ Sort the bindings by key mods and key.
+
+        Return a dict with a tuple per key mods: a dict with the
+        bindings by key and a list with the bindings that are checked
+        always. A binding is a tuple (order, keys, det_fun, fun,
+        det_args).
 
-        key_bindings = self.key_bindings
-        post = pygame.event.post
-        key_mods = self.key_mods
+        The keyboard detection functions are always False when the
+        keys are up, so those bindings are only checked while their
+        keys are down. A binding to several keys is stored with its
+        first key. Others, as the mouse ones, are checked always.
 
-        for keys, mods in key_bindings:
-            det_fun, fun, det_args = key_bindings[(keys, mods)]
-            if mods == key_mods:
-                if det_args:
-                    pressed = det_fun(self, keys, *det_args)
+        """
+        index = {}
+        for order, (keys, mods) in enumerate(self.key_bindings):
+            det_fun, fun, det_args = self.key_bindings[(keys, mods)]
+            by_key, always = index.setdefault(mods, ({}, []))
+            binding = (order, keys, det_fun, fun, det_args)
+            if det_fun in (INSTANT, DELAYED):
+                key = keys[0] if isinstance(keys, tuple) else keys
+                by_key.setdefault(key, []).append(binding)
+            else:
+                always.append(binding)
+        return index
+
+    def run_bindings(self):
+        """ Run the functions/post the events of the bindings of the
+        keys down. """
+
+        if self.bindings_index is None:
+            self.bindings_index = self.index_bindings()
+        try:
+            by_key, bindings = self.bindings_index[self.key_mods]
+        except KeyError:
+            return
+
+        held = self.kb_held
+        if held:
+            bindings = list(bindings)
+            for key in held:
+                bindings.extend(by_key.get(key, ()))
+            bindings.sort()
+
+        post = bus.post
+        for order, keys, det_fun, fun, det_args in bindings:
+            if det_args:
+                pressed = det_fun(self, keys, *det_args)
+            else:
+                pressed = det_fun(self, keys)
+            
+            if pressed:
+                if isinstance(fun, EventType):
+                    post(fun)
+                    if self.recorder:
+                        self.recorder.posted(fun)
+                    elif self.replay:
+                        self.replay.posted(fun)
                 else:
-                    pressed = det_fun(self, keys)
-                
-                if pressed:
-                    try:
-                        post(fun)
-                    except TypeError:
-                        fun()
-                    except pygame.error:
-                        print pygame.event.get()
-                        raise
+                    fun()
 
     def kb_is_pressed(self, key):
         """ Returns True if the given key, represented by a pygame.K
@@ -246,7 +317,7 @@ class Input(object):
 
         # Update timer and return propper value
         if pressed:
-            if key in self.kb_timers.keys():
+            if key in self.kb_timers:
                 if self.kb_timers[key].finished:
                     self.kb_timers[key].reset()
                     return True
@@ -265,7 +336,7 @@ class Input(object):
 
         # Update timer and return propper value
         if pressed:
-            if button in self.ms_timers.buttons():
+            if button in self.ms_timers:
                 if self.ms_timers[button].finished:
                     self.ms_timers[button].reset()
                     return True
@@ -27,10 +27,14 @@ class QuadTree(object):
     Acknowledgements:
     [1] http://mu.arete.cc/pcr/syntax/quadtree/1/quadtree.py
     
+    QuadTree.queries counts the calls to hit() of all the trees.
+    
     Taken from:
     http://www.pygame.org/wiki/QuadTree?parent=CookBook
     And slightly modified for my own purposes for TryEngine.
     """
+    queries = 0
+    
     def __init__(self, items, depth=4, bounding_rect=None):
         """Creates a quad-tree.
  
@@ -112,6 +116,10 @@ class QuadTree(object):
             The bounding rectangle being tested against the quad-tree. This
             must possess left, top, right and bottom attributes.
         """
+        QuadTree.queries += 1
+        return self._hit(rect)
+    
+    def _hit(self, rect):
         def overlaps(item):
             cr = item.col_rect
             #~ print "rect.bottom", rect.bottom
@@ -124,12 +132,12 @@ class QuadTree(object):
         
         # Recursively check the lower quadrants.
         if self.nw and rect.left <= self.cx and rect.top <= self.cy:
-            hits.extend(self.nw.hit(rect))
+            hits.extend(self.nw._hit(rect))
         if self.sw and rect.left <= self.cx and rect.bottom >= self.cy:
-            hits.extend(self.sw.hit(rect))
+            hits.extend(self.sw._hit(rect))
         if self.ne and rect.right >= self.cx and rect.top <= self.cy:
-            hits.extend(self.ne.hit(rect))
+            hits.extend(self.ne._hit(rect))
         if self.se and rect.right >= self.cx and rect.bottom >= self.cy:
-            hits.extend(self.se.hit(rect))
+            hits.extend(self.se._hit(rect))
  
         return hits
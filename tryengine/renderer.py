@@ -25,14 +25,16 @@ conjunction with the camera module and level module.
 """
 
 
+from itertools import chain
 from math import exp, ceil
 
-from pygame import Surface, time, Rect, Color, event
+from pygame import Surface, time, Rect, Color
 
-from level import ImageLayer, ObjectLayer, TileLayer
+from level import ImageLayer, ObjectLayer, TileLayer, draw_static_layer
 from constants import *
+from eventbus import bus
 from utils import copy_visible_rects_from_sprites, rects_from_sprites,\
-                  col_rects_from_sprites
+                  col_rects_from_sprites, interpolate_position
 from camera import Camera, FreeCamera, ScrollCamera
 import settings as s
 
@@ -218,6 +220,11 @@ class Renderer(object):
 
 class LayeredRenderer(Renderer):
     """ A renderer that uses all the layers in a tiled map. """
+
+    # Sprites and cameras moving more pixels than this in an update
+    # have been teleported, they are not interpolated
+    interpolation_max_distance = 32
+
     def __init__(self, level, screen_size_in_tiles, display_size):
 
         # the next few variables are used to initialize the parent
@@ -254,16 +261,49 @@ class LayeredRenderer(Renderer):
         self.ratio_dest = (0,0)
         self.new_size = self.display_size
 
+        # Part of the map in the screen in the last frame
+        self.view_rect = None
+
+        # Number and pixels of the rects redrawn in the last frame
+        self.dirty_rect_count = 0
+        self.dirty_area = 0
+
+        # What to do for every code of the RENDERER events
+        self.event_handlers = {
+            FADE: self.toggle_fade,
+            NEXT_CAMERA: self.next_camera,
+            CAMERA_LEFT: lambda: self.current_camera.accel_left(),
+            CAMERA_RIGHT: lambda: self.current_camera.accel_right(),
+            CAMERA_UP: lambda: self.current_camera.accel_up(),
+            CAMERA_DOWN: lambda: self.current_camera.accel_down(),
+            CAMERA_SHAKE: lambda: self.current_camera.shake(30, 5),
+            }
+
         self.debug_images = False
         self.debugging = False
 
     def coords_from_screen_to_map(self, screen_coords):
         ratio_x = float(self.screen_size[0]) / float(self.display_size[0])
         ratio_y = float(self.screen_size[1]) / float(self.display_size[1])
-        new_coord_x = screen_coords[0] * ratio_x + self.current_camera.screen_rect[0]
-        new_coord_y = screen_coords[1] * ratio_y + self.current_camera.screen_rect[1]
+        # nothing drawn yet, use where the camera is now
+        view_rect = self.view_rect or self.current_camera.interpolated_rect(
+            1., self.interpolation_max_distance)
+        new_coord_x = screen_coords[0] * ratio_x + view_rect[0]
+        new_coord_y = screen_coords[1] * ratio_y + view_rect[1]
         return new_coord_x,new_coord_y
 
+    def save_positions(self):
+        """ Keep the positions of the sprites before a game update,
+        the drawing is interpolated between them and the new ones. """
+        for layer in self.level.layers:
+            if isinstance(layer, ObjectLayer):
+                for spr in chain(layer.sprites(), layer.actionsprites.sprites()):
+                    spr.prev_pos = spr.rect.topleft
+
+    def update_camera(self):
+        """ Move the camera, after a game update. """
+        self.current_camera.update()
+
     def coords_from_map_to_screen(self, coords):
         pass
 
@@ -279,21 +319,20 @@ class LayeredRenderer(Renderer):
         if surface == None:
             surface = self.map_background
 
-        for i in range(len(self.level.layers)):
-            layer = self.level.layers[i]
-            if layer.visible:
-                if isinstance(layer, ImageLayer):
-                    layer.draw(surface)
-                elif isinstance(layer, TileLayer):
-                    # TODO
-                    # animated tiles need som special treatment too
-                    layer.static.draw(surface)
-                elif isinstance(layer, ObjectLayer):
-                    pass
+        for layer in self.level.layers:
+            if not isinstance(layer, ObjectLayer):
+                draw_static_layer(layer, surface)
 
         if self.full_map == None:
             self.full_map = self.map_background.copy()
 
+    def set_map_background(self, surface):
+        """ Use surface, with the static part of the map already drawn
+        (see MapPreloader), instead of calling render_map_background. """
+        self.map_background = surface
+        if self.full_map == None:
+            self.full_map = surface.copy()
+
     def get_dirty_rects(self):
         """ Get all the rects that need to be repainted.
         DEPRECATED
@@ -409,19 +448,18 @@ class LayeredRenderer(Renderer):
         dirty_rects = []
         tmp_dirty_rects = []
 
+        max_distance = self.interpolation_max_distance
         for i in xrange(len(self.level.layers)):
             layer = self.level.layers[i]
             
             if isinstance(layer, ObjectLayer):
-                for spr in layer.sprites():
-                    try:
-                        vx = spr.vx
-                        vy = spr.vy
-                    except AttributeError:
-                        vx = vy = 0.
-                    spr.i_rect = spr.rect.move(vx*interpolate, vy*interpolate)
-                # TODO: need to get the interpolated rect, no the original one
-                tmp_dirty_rects.extend([spr.i_rect.copy() for spr in layer.sprites()])
+                # Draw the sprites between their last two positions
+                for spr in chain(layer.sprites(), layer.actionsprites.sprites()):
+                    rect = spr.rect
+                    pos = interpolate_position(getattr(spr, 'prev_pos', None),
+                        rect.topleft, interpolate, max_distance)
+                    spr.i_rect = Rect(pos, rect.size)
+                    tmp_dirty_rects.append(spr.i_rect.copy())
                 # Next two also need to copy rectangles, if not bad things happen with 
                 # not moving sprites
                 tmp_dirty_rects.extend([i.copy() for i in layer.spritedict.values() if i != 0])
@@ -436,6 +474,8 @@ class LayeredRenderer(Renderer):
 
         for r in tmp_dirty_rects:
             union_add(dirty_rects, r)
+        self.dirty_rect_count = len(dirty_rects)
+        self.dirty_area = sum(r.w * r.h for r in dirty_rects)
 
         # Clear them in the map
         for r in dirty_rects:
@@ -492,29 +532,18 @@ class LayeredRenderer(Renderer):
 
         # get the camera and the screen rect
         cm = self.current_camera
-        #~ print cm.screen_rect
-        self.current_screen = self.full_map.subsurface(cm.screen_rect)
+        self.view_rect = cm.interpolated_rect(interpolate, max_distance)
+        self.current_screen = self.full_map.subsurface(self.view_rect)
 
         # Get events and update stuff
         self.get_events()
 
     def get_events(self):
-        l = event.get(RENDERER)
-        for e in l:
-            if e.code == FADE:
-                self.toggle_fade()
-            elif e.code == NEXT_CAMERA:
-                self.next_camera()
-            elif e.code == CAMERA_LEFT:
-                self.current_camera.accel_left()
-            elif e.code == CAMERA_RIGHT:
-                self.current_camera.accel_right()
-            elif e.code == CAMERA_UP:
-                self.current_camera.accel_up()
-            elif e.code == CAMERA_DOWN:
-                self.current_camera.accel_down()
-            elif e.code == CAMERA_SHAKE:
-                self.current_camera.shake(30, 5)
+        handlers = self.event_handlers
+        for e in bus.get(RENDERER):
+            handler = handlers.get(e.code)
+            if handler:
+                handler()
             else:
                 print "WARNING: Unhandled event code in renderer: {0}".format(e)
 
@@ -572,3 +601,10 @@ class LayeredRenderer(Renderer):
 
     def redraw_background(self):
         self.full_map = self.map_background.copy()
+
+    def rebuild_map_background(self):
+        """ Render again the static part of the map, needed when its
+        layers have changed. """
+        self.map_background.fill(BLACK)
+        self.render_map_background()
+        self.redraw_background()
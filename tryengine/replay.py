@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#   This file is part of TryEngine.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" Recording and replay of the player input.
+
+An InputRecorder is given to an Input, which stores, for every game
+update, the key modifiers, the input events it processed and the events
+posted by its key bindings. An InputReplay feeds a recording back to an
+Input in place of the keyboard and the mouse.
+
+The game is the same every time if it uses the same random seed and
+all the timing is done in game time (see utils.timers), so the posted
+events are compared with the recorded ones to catch desyncs.
+
+The file has JSON lines, the first one a header with the seed and the
+map, then a line per update: [key_mods, input_events, posted_events].
+
+"""
+
+import json
+
+from pygame import KEYDOWN, KEYUP, MOUSEMOTION, MOUSEBUTTONDOWN, MOUSEBUTTONUP
+from pygame.event import Event
+
+# Change it every time the format changes
+REPLAY_VERSION = 1
+
+# Attributes stored for every type of input event
+EVENT_ATTRIBUTES = {
+    KEYDOWN: ('key',),
+    KEYUP: ('key',),
+    MOUSEMOTION: ('pos', 'rel'),
+    MOUSEBUTTONDOWN: ('pos', 'button'),
+    MOUSEBUTTONUP: ('pos', 'button'),
+    }
+
+
+class ReplayError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+        Exception.__init__(self, msg)
+
+
+def _posted_key(event):
+    """ What is compared of a posted event. """
+    return [event.type, getattr(event, 'code', None)]
+
+
+class InputRecorder(object):
+    """ Write the input of every update to a replay file. """
+
+    def __init__(self, filename, seed, map_path):
+        self.filename = filename
+        self.f = open(filename, 'w')
+        header = {'version': REPLAY_VERSION, 'seed': seed, 'map': map_path}
+        self.f.write(json.dumps(header) + "\n")
+        self._tick = None
+
+    def begin_tick(self, key_mods, events):
+        """ Start the record of an update with its input. """
+        self._write_tick()
+        recorded = []
+        for event in events:
+            attributes = EVENT_ATTRIBUTES.get(event.type)
+            if attributes:
+                recorded.append([event.type] +
+                                [getattr(event, a) for a in attributes])
+        self._tick = [key_mods, recorded, []]
+
+    def posted(self, event):
+        """ Add an event posted by a key binding in this update. """
+        if self._tick is not None:
+            self._tick[2].append(_posted_key(event))
+
+    def _write_tick(self):
+        if self._tick is not None:
+            self.f.write(json.dumps(self._tick) + "\n")
+            self._tick = None
+
+    def close(self):
+        self._write_tick()
+        self.f.close()
+
+
+class InputReplay(object):
+    """ Read a replay file and give its input update by update. """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename) as f:
+            header = json.loads(f.readline())
+            if header.get('version') != REPLAY_VERSION:
+                raise ReplayError("The replay {0} has an unknown version.".format(filename))
+            self.seed = header['seed']
+            self.map_path = header['map']
+            self.ticks = [json.loads(line) for line in f]
+
+        self.tick = 0
+        self.desyncs = 0
+        self._expected = None
+        self._posted = []
+
+    @property
+    def finished(self):
+        return self.tick >= len(self.ticks)
+
+    def next_tick(self):
+        """ Return the key modifiers and the input events of the next
+        update. """
+        self._check_posted()
+        key_mods, events, self._expected = self.ticks[self.tick]
+        self.tick += 1
+        self._posted = []
+        return key_mods, [Event(e[0], dict((a, tuple(v) if isinstance(v, list) else v)
+                                           for a, v in zip(EVENT_ATTRIBUTES[e[0]], e[1:])))
+                          for e in events]
+
+    def posted(self, event):
+        """ Add an event posted by a key binding in this update. """
+        self._posted.append(_posted_key(event))
+
+    def _check_posted(self):
+        if self._expected is not None and self._posted != self._expected:
+            self.desyncs += 1
+            print "Replay desync in update {0}: expected {1}, got {2}".format(
+                self.tick - 1, self._expected, self._posted)
+        self._expected = None
+
+    def close(self):
+        self._check_posted()
+        print "Replay {0}: {1} of {2} updates, {3} desyncs".format(
+            self.filename, self.tick, len(self.ticks), self.desyncs)
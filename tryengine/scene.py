@@ -21,6 +21,9 @@
 
 import pygame
 
+from utils import Borg
+
+glo = Borg()
 
 class Scene(object):
     """ Used by engine.py in union with scenestack.py to run scenes.
@@ -67,6 +70,70 @@ class Scene(object):
 
 
 
+class LazyScene(Scene):
+    """ Placeholder for a scene that is created when it's needed.
+
+    factory is a callable returning the real scene. It's called the
+    first time the scene is on top or its frame is needed, then the real
+    scene takes the place of this one in the scene stack. If the
+    placeholder is finished before that the real scene is never created.
+
+    on_drop is called in that case, to cancel the work done for the
+    real scene.
+
+    """
+
+    def __init__(self, factory, on_drop=None):
+        Scene.__init__(self)
+        self.factory = factory
+        self.on_drop = on_drop
+        self.finished = False
+        self.scene = None
+
+    def create(self):
+        """ Create the real scene and put it in the stack. """
+        if not self.scene:
+            self.scene = self.factory()
+            self.stack.replace(self, self.scene)
+        return self.scene
+
+    def pause(self):
+        pass
+
+    def unpause(self):
+        # Being dropped, don't create it just for this
+        if self.finished or glo.quitting:
+            return
+        self.create().unpause()
+
+    def stop(self):
+        if not self.scene and self.on_drop:
+            self.on_drop()
+
+    def _after_init(self):
+        pass
+
+    def update(self, *args):
+        self.create().update(*args)
+
+    def handle_input(self, *args):
+        self.create().handle_input(*args)
+
+    def handle_events(self, *args):
+        self.create().handle_events(*args)
+
+    @property
+    def frame(self):
+        # Dropped before being needed, don't create it just for this
+        if self.finished and not self.scene:
+            return None
+        return self.create().frame
+
+    @property
+    def new_frame(self):
+        return self.create().new_frame
+
+
 def center_in_length(obj_size, room_size):
     """ Return the location in which the object is centered in room."""
     return (room_size - obj_size)/2
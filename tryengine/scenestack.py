@@ -19,6 +19,8 @@
 
 """ Module handling a stack of scenes.""" 
 
+from eventbus import bus
+
 
 class SceneStack(object):
     """ Used to keep track of all the scenes: level, menu, etc. """
@@ -34,12 +36,30 @@ class SceneStack(object):
             top.paused = True
         scene._add_internal(self)
         self.stack.append(scene)
+        bus.clear_input()
         
         try:
             scene._after_init()
         except NotImplementedError:
             pass
     
+    def replace(self, old, new):
+        """ Put the scene new in the place of old.
+
+        new takes the paused state of old, pause() is not called since
+        new hasn't been running.
+        """
+        i = self.stack.index(old)
+        old._remove_internal(self)
+        new._add_internal(self)
+        new.paused = old.paused
+        self.stack[i] = new
+
+        try:
+            new._after_init()
+        except NotImplementedError:
+            pass
+
     def top(self):
         return self.stack[-1] if self.stack else None
     
@@ -51,7 +71,9 @@ class SceneStack(object):
         new_top = self.top()
         if new_top:
             new_top.unpause()
-            new_top.paused = False
+            # unpause() can put other scene in its place, see LazyScene
+            self.top().paused = False
+        bus.clear_input()
         
         self.last_frame = scene.frame
         return scene
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#   This file is part of TryEngine.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" Export of per frame telemetry to a file.
+
+The engine makes a record (a dict) every frame, or every few frames,
+and gives it to a TelemetryWriter. The records are written as CSV or
+as JSON lines by a worker thread, so writing the file doesn't take
+time from the frames. If the worker can't keep up, the records that
+don't fit in the queue are dropped and counted.
+
+"""
+
+import csv
+import json
+import threading
+from Queue import Queue, Full
+
+# Fields of a record, in the order of the CSV columns. Times are in
+# seconds, the scene fields are empty when the scene has no telemetry.
+FIELDS = [
+    'frame',            # frame index
+    'updates',          # game updates since the game started
+    'frame_updates',    # game updates run in this frame
+    'fps',              # frames per second in the last second
+    'ups',              # game updates run per second in the last second
+    'update_time',      # time spent running the updates of this frame
+    'render_time',      # time spent drawing the frame of the scene
+    'scale_time',       # time spent scaling the frame to the display
+    'flip_time',        # time spent in display.flip()
+    'mobs',             # live mobs in the scene
+    'particles',        # live particles in the scene
+    'actionsprites',    # live action sprites in the scene
+    'dirty_rects',      # dirty rects redrawn in the frame
+    'dirty_area',       # pixels of the dirty rects
+    'quadtree_queries', # collision quadtree queries per update
+    'dropped_events',   # SDL events dropped from full bus channels so far
+    ]
+
+FORMATS = ('csv', 'jsonl')
+
+
+class TelemetryWriter(object):
+    """ Write telemetry records to a file in a worker thread. """
+
+    def __init__(self, filename, fmt="csv", queue_size=1024):
+        if fmt not in FORMATS:
+            raise ValueError("Unknown telemetry format: {0}".format(fmt))
+        self.filename = filename
+        self.fmt = fmt
+        self.queue = Queue(queue_size)
+        # records lost because the queue was full
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, record):
+        """ Queue a record, never blocks. """
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def close(self):
+        """ Write the records left and close the file. """
+        self.queue.put(None)
+        self._thread.join()
+        if self.dropped:
+            print "Warning! {0} telemetry records were dropped.".format(self.dropped)
+
+    def _run(self):
+        """ Worker thread. """
+        queue = self.queue
+        with open(self.filename, 'wb') as f:
+            if self.fmt == 'csv':
+                writer = csv.DictWriter(f, FIELDS, extrasaction='ignore')
+                writer.writeheader()
+                write = writer.writerow
+            else:
+                write = lambda record: f.write(json.dumps(record) + "\n")
+
+            while True:
+                record = queue.get()
+                if record is None:
+                    break
+                write(record)
+                # Don't leave records in the buffer while the game waits
+                if queue.empty():
+                    f.flush()
@@ -19,15 +19,19 @@
 
 """ Module with utils/functions. """
 
-from math import hypot
+from collections import OrderedDict
+from heapq import heappush, heappop
+from itertools import count
+from math import hypot, ceil
+import os.path
 import weakref
 
-from pygame.time import get_ticks
 from pygame.mixer import Sound
 import pygame as pg
 from pygame import Surface, BLEND_MULT
 
 from constants import PINK_TRANSPARENT, BLACK
+import settings as s
 
 #======================
 # FUNCTIONS
@@ -101,12 +105,102 @@ def memoizer(new_dict=dict):
 weak_memorizer = memoizer(new_dict = weakref.WeakValueDictionary)
 
 
-@weak_memorizer
+def asset_size(asset):
+    """ Return the approximate size in bytes of a surface or a sound. """
+    if isinstance(asset, Surface):
+        return asset.get_pitch() * asset.get_height()
+    elif isinstance(asset, Sound) and pg.mixer.get_init():
+        frequency, size, channels = pg.mixer.get_init()
+        return int(asset.get_length() * frequency * channels * abs(size) / 8)
+    return 0
+
+
+class AssetCache(object):
+    """ LRU cache of loaded assets with a budget in bytes.
+
+    Unlike weak_memorizer it keeps strong references, so an asset used
+    by consecutive levels isn't loaded again, and it drops the least
+    recently used assets when the budget is exceeded. Use memoize as
+    decorator for the loading functions, and their discard() to load
+    again a file that has changed.
+
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._assets = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def memoize(self, func):
+        """ Decorator caching the results of func by its arguments. """
+        def memo(*args):
+            key = (func.__name__, args)
+            try:
+                asset, size = self._assets.pop(key)
+                self.hits += 1
+            except KeyError:
+                self.misses += 1
+                asset = func(*args)
+                size = asset_size(asset)
+                self.bytes += size
+            self._assets[key] = asset, size
+            self._evict()
+            return asset
+
+        memo.__name__ = func.__name__
+        memo.__doc__ = func.__doc__
+        memo.discard = lambda *args: self.discard((func.__name__, args))
+        return memo
+
+    def discard(self, key):
+        """ Drop an asset, the next call loads it again. """
+        try:
+            asset, size = self._assets.pop(key)
+        except KeyError:
+            return
+        self.bytes -= size
+
+    def _evict(self):
+        """ Drop the least recently used assets to fit in the budget,
+        the last used one is always kept. """
+        while self.bytes > self.max_bytes and len(self._assets) > 1:
+            key, (asset, size) = self._assets.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        self._assets.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """ Return a dict with the cache statistics. """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'assets': len(self._assets),
+                'bytes': self.bytes, 'max_bytes': self.max_bytes}
+
+    def __str__(self):
+        return "AssetCache: {hits} hits, {misses} misses, {evictions} evictions, {assets} assets, {bytes}/{max_bytes} bytes".format(**self.stats())
+
+
+# Shared by all the loaders of images and sounds
+asset_cache = AssetCache(s.asset_cache_size)
+
+
+@asset_cache.memoize
+def load_image(filename):
+    """ Load an image as it is in the file, without converting it. """
+    return pg.image.load(filename)
+
+
+@asset_cache.memoize
 def image_loader(filename):
     """ Loads an image with fixed settings.
     
-    Apply PINK_TRANSPARENT as colorkey and fastest flags. It also
-    has a decorator with a lazy resource loader.
+    Apply PINK_TRANSPARENT as colorkey and fastest flags. Images are
+    kept in the asset cache, don't modify them.
 
     """
 
@@ -128,11 +222,11 @@ def extend_dict(to_extend, extension):
         to_extend[key] = extension[key]
 
 
-@weak_memorizer
+@asset_cache.memoize
 def load_sound(filename):
     """ Properly load a sound file with fixed settings.
 
-    It also has a decorator with a lazy resource loader.
+    Sounds are kept in the asset cache.
 
     """
 
@@ -229,22 +323,111 @@ def copy_visible_rects_from_sprites(sprites):
 # HOMELESS CLASSES
 #=======================
 
+class TimerService(object):
+    """ Game time, counted in updates of the game clock, and the
+    scheduler of the Timers.
+
+    The engine calls tick() and fire_due() once per game update, so
+    everything timed with it follows the game and not the wall clock,
+    and runs the same every time the same updates happen.
+
+    Timers are kept in a heap ordered by the tick they finish in, and
+    fire_due() only looks at the ones that are due.
+
+    """
+
+    def __init__(self, ticks_per_second):
+        self.ticks = 0
+        self.ticks_per_second = float(ticks_per_second)
+        # Fraction of the next tick elapsed when the frame is drawn, set
+        # by the engine
+        self.interpolate = 0.
+        # (deadline, number, timer), the number keeps the order in which
+        # timers with the same deadline were scheduled
+        self._heap = []
+        self._numbers = count()
+
+    @property
+    def time(self):
+        """ Game time in seconds. """
+        return self.ticks / self.ticks_per_second
+
+    def tick(self):
+        """ Advance the game time one tick. """
+        self.ticks += 1
+
+    def deadline(self, start, seconds):
+        """ Return the first tick at least seconds of game time after
+        the tick start. """
+        tps = self.ticks_per_second
+        tick = start + max(0, int(ceil(seconds * tps)))
+        # seconds * tps is not exact, the ticks are compared in seconds
+        # as the game time is
+        while tick > start and (tick - 1) / tps - start / tps >= seconds:
+            tick -= 1
+        while tick / tps - start / tps < seconds:
+            tick += 1
+        return tick
+
+    def schedule(self, timer):
+        """ Finish timer in its deadline. """
+        heappush(self._heap, (timer.deadline, next(self._numbers), timer))
+
+    def fire_due(self):
+        """ Finish the timers whose deadline has come. """
+        heap = self._heap
+        while heap and heap[0][0] <= self.ticks:
+            deadline, n, timer = heappop(heap)
+            # It has been reset since it was scheduled
+            if timer.deadline > deadline:
+                self.schedule(timer)
+            else:
+                timer.scheduled = False
+                timer.finished = True
+
+
+def interpolate_position(prev, current, interpolate, max_distance):
+    """ Return the position at the fraction interpolate of the way
+    from prev to current, rounded to pixels.
+
+    If prev is None or the distance in any axis is bigger than
+    max_distance (it has been teleported) return current.
+
+    """
+    if prev is None:
+        return current
+    dx = current[0] - prev[0]
+    dy = current[1] - prev[1]
+    if abs(dx) > max_distance or abs(dy) > max_distance:
+        return current
+    return (int(round(prev[0] + dx * interpolate)),
+            int(round(prev[1] + dy * interpolate)))
+
+
+# Game time used by all the Timers, owned and ticked by the engine
+timers = TimerService(s.TICKS_PER_SECOND)
+
+
 class Timer(object):
-    """ Very basic timer. Input in seconds"""
+    """ Very basic timer. Input in seconds of game time.
+
+    finished is a flag set by the TimerService when the time has
+    passed, reading it costs nothing.
+    """
     def __init__(self, seconds):
         self.delay = seconds
-        # get_ticks return milliseconds
-        self.start_time = get_ticks() / 1000.
+        self.scheduled = False
+        self.reset()
     
     def reset(self):
         """ Put to zero the timer. """
-        self.start_time = get_ticks() / 1000.
-
-    @property
-    def finished(self):
-        """ When True the timer has finished. """
-        time_until_now = (get_ticks() / 1000.) - self.start_time
-        return time_until_now >= self.delay
+        self.deadline = timers.deadline(timers.ticks, self.delay)
+        self.finished = self.deadline <= timers.ticks
+        # A timer already in the heap is moved to its new deadline
+        # when the old one comes
+        if not self.finished and not self.scheduled:
+            self.scheduled = True
+            timers.schedule(self)
 
 
 class Borg(object):
@@ -257,3 +440,13 @@ class Borg(object):
     _shared_state = {}
     def __init__(self):
         self.__dict__ = self._shared_state
+
+
+def free_filename(name, too_many):
+    """ Return the first name.format(i) that isn't an existing file,
+    or too_many if there are 1000 of them. """
+    for i in range(1000):
+        t = name.format(i)
+        if not os.path.isfile(t):
+            return t
+    return too_many